@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+
+# Benchmark without a window or sound device, before pygame is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+# Version of the JSON report, changed whenever its layout changes
+REPORT_VERSION = 1
+
+# A fixed corpus covering each way a relation is solved and plotted
+CORPUS = [('parabola', "y=x^2"),
+          ('sine', "y=sin(x)"),
+          ('tangent', "y=tan(x)"),
+          ('vertical line', "x=3"),
+          ('cube root', "y=x^(1/3)"),
+          ('rational power', "y=(x^2-1)^(2/3)"),
+          ('factorial', "y=factorial(x)"),
+          ('circle', "x^2+y^2=25"),
+          ('implicit', "sin(x*y)=0.5")]
+
+# Half the width of each square domain and range benchmarked, graphed at the scale that fits it to the graph
+DOMAINS = (5, 10, 50, 100)
+GRAPH_SIZE = (650, 700)
+
+# Stages timed for every relation and domain
+STAGES = ('parse', 'solve', 'sample', 'draw', 'frame', 'frame_cached', 'frame_pan')
+
+
+def clear_caches() -> None:
+    """Forget every cached solution, rewritten branch, compiled function and domain, so each repeat starts cold."""
+    from calc.cache import SOLUTIONS, BRANCHES, COMPILED, DOMAINS
+    SOLUTIONS.clear()
+    BRANCHES.clear()
+    COMPILED.clear()
+    DOMAINS.clear()
+
+
+def fit_scale(domain) -> int:
+    """Return the scale, within the range of the graph's sliders, that fits a domain of -domain to domain."""
+    return max(1, min(400, int(min(GRAPH_SIZE) / (2 * domain))))
+
+
+def settle(graph, bounds, relations, scale) -> None:
+    """Draw a graph until every relation has been calculated."""
+    graph.create(bounds, bounds, relations, (0, 0), scale, scale)
+    while any(len(jobs) > 0 for jobs in graph.pending.values()):
+        graph.create(bounds, bounds, relations, (0, 0), scale, scale)
+
+
+def run_case(equation, domain) -> dict:
+    """
+    Run one relation through every stage of the pipeline at one domain size, timing each stage.
+    Returns the stage times in seconds, and the number of points, lines and tiles calculated.
+    """
+    from calc.graphing import Graph, BACKGROUND_GREY, COLOURS
+    from calc.relations import Relation
+    from calc.scheduler import calculate_job
+    from calc.curves import join_curves
+    from calc.layers import Layer
+
+    bounds = (-domain, domain)
+    scale = fit_scale(domain)
+    origin = (GRAPH_SIZE[0] / 2, GRAPH_SIZE[1] / 2)
+    viewport = ((-origin[0] / scale, origin[0] / scale), (-origin[1] / scale, origin[1] / scale))
+    times = {}
+    clear_caches()
+
+    start = time.perf_counter()
+    relation = Relation(equation, COLOURS[0])
+    times['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    relation.solve()
+    times['solve'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tiles, kind, _, _ = calculate_job(relation, bounds, bounds, viewport, (scale, scale), None, None)
+    times['sample'] = time.perf_counter() - start
+    curve = join_curves(list(tiles.values()))
+
+    start = time.perf_counter()
+    Layer(curve, relation.get_colour(), (scale, scale), origin, GRAPH_SIZE, BACKGROUND_GREY)
+    times['draw'] = time.perf_counter() - start
+
+    # Frames are drawn by a new graph, with the relation already solved but nothing compiled or calculated
+    from calc.cache import COMPILED, DOMAINS
+    COMPILED.clear()
+    DOMAINS.clear()
+    graph = Graph(GRAPH_SIZE)
+    graph.set_pos((0, 0))
+    start = time.perf_counter()
+    settle(graph, bounds, [relation], scale)
+    times['frame'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.create(bounds, bounds, [relation], (0, 0), scale, scale)
+    times['frame_cached'] = time.perf_counter() - start
+
+    graph.shift_x(5)
+    start = time.perf_counter()
+    settle(graph, bounds, [relation], scale)
+    times['frame_pan'] = time.perf_counter() - start
+
+    return {'times': times, 'points': int(curve.offsets[-1]), 'lines': len(curve), 'tiles': len(tiles)}
+
+
+def peak_memory(equation, domain) -> int:
+    """Return the most memory, in bytes, allocated at once while running one case through the pipeline."""
+    tracemalloc.start()
+    try:
+        run_case(equation, domain)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(corpus, domains, repeat) -> dict:
+    """Benchmark every relation of a corpus at every domain size. Returns the report."""
+    from calc import scheduler
+
+    # Calculate inline, so stages are timed in this process rather than queued on a pool
+    scheduler.set_max_workers(0)
+    pygame.display.init()
+    pygame.font.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+    # Run the first case once without timing it, so that one-off costs of first use are not counted
+    run_case(corpus[0][1], domains[0])
+
+    results = []
+    for name, equation in corpus:
+        for domain in domains:
+            runs = [run_case(equation, domain) for _ in range(repeat)]
+            stages = {stage: {'median': statistics.median(run['times'][stage] for run in runs),
+                              'min': min(run['times'][stage] for run in runs)} for stage in STAGES}
+            result = {'name': name, 'equation': equation, 'domain': domain, 'scale': fit_scale(domain),
+                      'points': runs[0]['points'], 'lines': runs[0]['lines'], 'tiles': runs[0]['tiles'],
+                      'stages': stages, 'peak_memory': peak_memory(equation, domain)}
+            result['throughput'] = {
+                'points_per_second': result['points'] / stages['sample']['median'] if stages['sample']['median'] else None,
+                'cached_frames_per_second': 1 / stages['frame_cached']['median'] if stages['frame_cached']['median'] else None}
+            results.append(result)
+            print(f"{name:>15} {domain:>4}  " + "  ".join(f"{stage} {stages[stage]['median'] * 1000:8.2f}ms"
+                                                          for stage in STAGES), file=sys.stderr)
+
+    return {'version': REPORT_VERSION, 'python': platform.python_version(), 'platform': platform.platform(),
+            'repeat': repeat, 'results': results}
+
+
+def compare(report, baseline) -> list:
+    """
+    Compare the median stage times of two reports, for each case found in both.
+    Returns lines of the ratio of each stage, where below 1 is faster than the baseline.
+    """
+    cases = {(result['equation'], result['domain']): result for result in baseline['results']}
+    lines = []
+    for result in report['results']:
+        previous = cases.get((result['equation'], result['domain']))
+        if previous is None:
+            continue
+        ratios = []
+        for stage in STAGES:
+            before, after = previous['stages'][stage]['median'], result['stages'][stage]['median']
+            ratios.append(f"{stage} {after / before:5.2f}x" if before > 0 else f"{stage}   n/a")
+        lines.append(f"{result['name']:>15} {result['domain']:>4}  " + "  ".join(ratios))
+    return lines
+
+
+def peak_rss():
+    """Return the most resident memory the process has used, in kilobytes, or None where it is not reported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Insidia's calculation and drawing pipeline without a window.")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="times each case is run, reporting the median")
+    parser.add_argument('-d', '--domain', type=int, action='append', dest='domains',
+                        help="half the width of a domain to benchmark, may be repeated")
+    parser.add_argument('-k', '--filter', help="only benchmark relations whose name contains this text")
+    parser.add_argument('-o', '--out', help="file to write the JSON report to, instead of standard output")
+    parser.add_argument('-c', '--compare', help="a previous JSON report to compare the median times against")
+    args = parser.parse_args(argv)
+
+    # Assets are found relative to the working directory, as they are when running main.py
+    from commons import get_current_path
+    os.chdir(get_current_path())
+
+    from main import square_wave
+    corpus = CORPUS + [('demo', square_wave(31))]
+    if args.filter:
+        corpus = [case for case in corpus if args.filter in case[0]]
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report = benchmark(corpus, tuple(args.domains or DOMAINS), max(1, args.repeat))
+    report['max_rss'] = peak_rss()
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if baseline is not None:
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
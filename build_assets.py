@@ -0,0 +1,45 @@
+import os
+
+# Build without a window or sound device, before pygame is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+
+def build_demo() -> str:
+    """
+    Calculate the home page's demo graph at its default scales and write its curves to the bundled demo asset,
+    so that launching Insidia maps them instead of solving the demo. Returns the path of the asset.
+    """
+    from commons import get_current_path
+    os.chdir(get_current_path())
+
+    import main
+    from calc import scheduler
+    from calc.graphing import Graph
+    from calc.relations import Relation
+    from calc.assets import write_curve_asset
+
+    # Calculate inline, so the build does not start a process pool
+    scheduler.set_max_workers(0)
+    pygame.display.init()
+    pygame.font.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+    graph = Graph(main.DEMO_SIZE)
+    graph.set_pos((0, 0))
+    relations = [Relation(main.square_wave(31), main.DEMO_PURPLE)]
+    scales = [slider.value() for slider in graph.get_sliders()]
+    graph.create(main.DEMO_DOMAIN, main.DEMO_RANGE, relations, (0, 0), scales[0], scales[1])
+    while any(len(jobs) > 0 for jobs in graph.pending.values()):
+        graph.create(main.DEMO_DOMAIN, main.DEMO_RANGE, relations, (0, 0), scales[0], scales[1])
+
+    os.makedirs(os.path.dirname(main.DEMO_ASSET), exist_ok=True)
+    write_curve_asset(main.DEMO_ASSET, graph.save('demo').curves)
+    return main.DEMO_ASSET
+
+
+if __name__ == '__main__':
+    print(build_demo())
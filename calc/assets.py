@@ -0,0 +1,73 @@
+import json
+import numpy as np
+from calc.curves import Curve
+from calc.relations import Relation, RelationError, is_safe_equation
+from calc.opus import OpusError, expression_hash, encode_solutions, decode_solutions, to_tuple
+
+# Version of the curve asset layout
+ASSET_VERSION = 1
+
+
+def write_curve_asset(path, curves) -> None:
+    """
+    Write the precomputed curves of a fake graph as a bundled asset: a JSON manifest, and the points and line offsets
+    of every tile in two uncompressed arrays, so that they can be memory-mapped instead of read.
+    Files are written to path with the suffixes .json, _points.npy and _offsets.npy.
+    """
+    points, offsets = [], []
+    point_count, offset_count = 0, 0
+    relations = []
+    for record in curves:
+        tiles = []
+        for tile, curve in record['tiles'].items():
+            tiles.append([tile, point_count, offset_count, offset_count + len(curve.offsets)])
+            points.append(curve.points)
+            offsets.append(curve.offsets)
+            point_count += len(curve.points)
+            offset_count += len(curve.offsets)
+        relations.append({'equation': record['equation'], 'hash': expression_hash(record['expression']),
+                          'kind': record['kind'], 'request': record['request'],
+                          'solutions': encode_solutions(record['solutions']), 'tiles': tiles})
+
+    np.save(path + '_points.npy', np.concatenate(points) if len(points) > 0 else np.empty((0, 2)))
+    np.save(path + '_offsets.npy', np.concatenate(offsets) if len(offsets) > 0 else np.empty(0, dtype=np.int64))
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'version': ASSET_VERSION, 'relations': relations}, f)
+
+
+def read_curve_asset(path) -> list:
+    """
+    Memory-map the curves of an asset written by write_curve_asset, keeping only those whose equation is safe to
+    parse and whose expression hash still matches the equality parsed from it. Returns records in the same form as opus.read_curves.
+    Raises OSError if the asset is missing, or OpusError if it is not valid.
+    """
+    with open(path + '.json', 'r', encoding='utf-8') as f:
+        try:
+            manifest = json.load(f)
+        except ValueError:
+            raise OpusError
+    if manifest.get('version') != ASSET_VERSION:
+        raise OpusError
+    try:
+        points = np.load(path + '_points.npy', mmap_mode='r', allow_pickle=False)
+        offsets = np.load(path + '_offsets.npy', mmap_mode='r', allow_pickle=False)
+    except ValueError:
+        raise OpusError
+
+    records = []
+    for relation in manifest['relations']:
+        if not is_safe_equation(relation['equation']):
+            continue
+        try:
+            equation = Relation(relation['equation'], None).get_expression()
+        except RelationError:
+            continue
+        if relation['hash'] != expression_hash(equation):
+            continue
+        tiles = {}
+        for tile, point_start, offset_start, offset_end in relation['tiles']:
+            line_offsets = offsets[offset_start:offset_end]
+            tiles[to_tuple(tile)] = Curve(points[point_start:point_start + line_offsets[-1]], line_offsets)
+        records.append((equation, relation['kind'], to_tuple(relation['request']),
+                        decode_solutions(relation['solutions']), tiles))
+    return records
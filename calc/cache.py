@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class ExpressionCache:
+    """
+    The expression cache structure is a process-wide, size-bounded store keyed by canonical symengine expressions.
+    Because the key is the parsed expression rather than the raw text, "y=x^2" and "y = x**2" share an entry.
+    The least recently used entry is evicted once the cache is full. Hits and misses are counted for inspection.
+    """
+    max_size: int
+    hits: int
+    misses: int
+
+    # A unique marker so that None can be cached as a legitimate value
+    MISSING = object()
+
+    # Initialise an empty cache that holds at most max_size entries
+    def __init__(self, max_size) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    # Return the cached value for a key and mark it as recently used, otherwise return MISSING
+    def get(self, key) -> object:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return self.MISSING
+
+    # Store a value, evicting the least recently used entries if the cache is full
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # Empty the cache and reset its counters
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    # Return the size and hit/miss counters of the cache
+    def stats(self) -> dict:
+        with self.lock:
+            return {'size': len(self.entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# Solved branches of each equality, the same branches with their roots made real, and the compiled numeric
+# callables and domains of each (symbol, branch) pair
+SOLUTIONS = ExpressionCache(256)
+BRANCHES = ExpressionCache(256)
+COMPILED = ExpressionCache(1024)
+DOMAINS = ExpressionCache(1024)
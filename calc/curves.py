@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class Curve:
+    """
+    The curve structure holds every line of a relation in one contiguous (n, 2) float64 array of points.
+    Offsets marks where each line starts, with a final entry for the end of the last line.
+    Lines are returned as views of the points array, so reading them never copies.
+    """
+    __slots__ = ('points', 'offsets')
+    points: np.ndarray
+    offsets: np.ndarray
+
+    # Initialise a curve from its points and line offsets, or an empty curve
+    def __init__(self, points=None, offsets=None) -> None:
+        self.points = np.empty((0, 2)) if points is None else np.ascontiguousarray(points, dtype=np.float64)
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else np.asarray(offsets, dtype=np.int64)
+
+    # Return the number of lines in the curve
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    # Return a view of a single line
+    def __getitem__(self, index) -> np.ndarray:
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    # Iterate over views of every line
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    # Return the index of the line that each point belongs to
+    def line_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    # Return the curve with every point mapped through an affine transform, keeping the same lines
+    def transformed(self, scales, origin):
+        return Curve(self.points * np.array(scales) + np.array(origin), self.offsets)
+
+
+def from_lines(lines) -> Curve:
+    """Pack a list of (n, 2) arrays into a curve."""
+    if len(lines) == 0:
+        return Curve()
+    return Curve(np.concatenate(lines), np.concatenate(([0], np.cumsum([len(line) for line in lines]))))
+
+
+def join_curves(curves) -> Curve:
+    """Concatenate the lines of several curves into one curve."""
+    curves = [curve for curve in curves if len(curve) > 0]
+    if len(curves) == 0:
+        return Curve()
+    if len(curves) == 1:
+        return curves[0]
+    offsets = [curves[0].offsets]
+    total = curves[0].offsets[-1]
+    for curve in curves[1:]:
+        offsets.append(curve.offsets[1:] + total)
+        total += curve.offsets[-1]
+    return Curve(np.concatenate([curve.points for curve in curves]), np.concatenate(offsets))
@@ -0,0 +1,256 @@
+import numpy as np
+import symengine
+import sympy
+from symengine import sympify, SympifyError
+from symengine.lib.symengine_wrapper import PyFunction, Boolean, Gamma
+from calc.cache import COMPILED, DOMAINS
+from calc import tracing
+from calc.sampling import adaptive_sample
+
+# Kinds of constraint on where a branch is defined: a pole where an expression is zero, an expression that must be
+# positive or non-negative, and the argument of a factorial, which has poles at the negative integers
+POLE, POSITIVE, NON_NEGATIVE, FACTORIAL = range(4)
+
+# Trigonometric functions with poles, and the function that is zero at each of their poles
+TRIG_POLES = {symengine.tan: symengine.cos, symengine.sec: symengine.cos,
+              symengine.cot: symengine.sin, symengine.csc: symengine.sin}
+
+# Trigonometric functions that cannot be compiled, and the functions they are the reciprocal of
+RECIPROCALS = {sympy.sec: sympy.cos, sympy.csc: sympy.sin, sympy.cot: sympy.tan}
+
+
+def rebuild(expression, args):
+    """
+    Return an expression with its arguments replaced. Functions only sympy defines, such as factorial, and conditions
+    cannot be rebuilt from their arguments by symengine, so their arguments are substituted instead.
+    """
+    if type(expression) == symengine.Piecewise:
+        return expression.func(*zip(args[::2], args[1::2]))
+    if isinstance(expression, (PyFunction, Boolean)) or not hasattr(expression, 'func'):
+        return expression.xreplace(dict(zip(expression.args, args)))
+    return expression.func(*args)
+
+
+def real_roots(expression, memo):
+    """
+    Rewrite every power with an odd-denominator rational exponent into its real root, |b|^(p/q) or sign(b)|b|^(p/q)
+    when p is odd, so that odd roots of negative numbers are real and any curve with an odd power renders correctly.
+    The tree is rewritten bottom-up in one pass. Each distinct subexpression is rewritten once and remembered in memo.
+    """
+    rewritten = memo.get(expression)
+    if rewritten is not None:
+        return rewritten
+    args = expression.args
+    rewritten_args = tuple(real_roots(arg, memo) for arg in args)
+    if type(expression) == symengine.Pow and type(args[1]) == symengine.Rational:
+        num, den = args[1].get_num_den()
+        if den % 2 == 1:
+            rewritten = symengine.Abs(rewritten_args[0]) ** args[1]
+            if num % 2 == 1:
+                rewritten = symengine.sign(rewritten_args[0]) * rewritten
+    if rewritten is None:
+        changed = any(arg is not new_arg for arg, new_arg in zip(args, rewritten_args))
+        rewritten = rebuild(expression, rewritten_args) if changed else expression
+    memo[expression] = rewritten
+    return rewritten
+
+
+def real_power(expression) -> bool:
+    """Return if an expression is a power with a real number as its exponent, such as x^2 but not x^I or x^y."""
+    return type(expression) == symengine.Pow and expression.args[1].is_Number and expression.args[1].is_real is True
+
+
+def pole_zeros(expression):
+    """Return an expression that changes sign at the same points as the given one is zero, without its absolute values."""
+    while type(expression) == symengine.Abs or (real_power(expression) and float(expression.args[1]) > 0):
+        expression = expression.args[0]
+    return expression
+
+
+def find_constraints(expression, found, seen) -> None:
+    """
+    Recursively observe an expression for anything that limits where it is defined, adding each constraint to found
+    as a (kind, expression) pair. Subexpressions in seen have already been observed.
+    """
+    if expression in seen:
+        return
+    seen.add(expression)
+    kind = type(expression)
+    if real_power(expression):
+        base, exponent = expression.args
+        if float(exponent) < 0:
+            found.append((POLE, pole_zeros(base)))
+        if isinstance(exponent, symengine.Rational) and exponent.get_num_den()[1] % 2 == 0:
+            found.append((POSITIVE if float(exponent) < 0 else NON_NEGATIVE, base))
+    elif kind in TRIG_POLES:
+        found.append((POLE, TRIG_POLES[kind](expression.args[0])))
+    elif kind == symengine.log:
+        found.append((POSITIVE, expression.args[0]))
+    elif kind == Gamma:
+        found.append((FACTORIAL, expression.args[0] - 1))
+    elif isinstance(expression, PyFunction) and expression.get_name() == "factorial":
+        found.append((FACTORIAL, expression.args[0]))
+    for arg in expression.args:
+        find_constraints(arg, found, seen)
+
+
+def branch_domain(symbol, expr) -> tuple:
+    """
+    Derive where a branch is defined, once per branch: the poles of its denominators, tangents and factorials,
+    and the arguments of its logarithms and even roots that cannot be negative. Returns each constraint as a
+    (kind, expression) pair, keeping only those that depend on the symbol.
+    Domains are shared process-wide, so re-sampling a known expression only evaluates them.
+    """
+    domain = DOMAINS.get((symbol, expr))
+    if domain is not DOMAINS.MISSING:
+        return domain
+    found = []
+    find_constraints(expr, found, set())
+    domain = tuple(constraint for constraint in dict.fromkeys(found) if symbol in constraint[1].free_symbols)
+    DOMAINS.put((symbol, expr), domain)
+    return domain
+
+
+def mask_undefined(domain, rows):
+    """
+    Return the first row of an evaluated branch, with NaN at every value outside its domain even where it evaluated.
+    The remaining rows are the values of each constraint of the domain.
+    """
+    results = rows[0]
+    for (kind, _), args in zip(domain, rows[1:]):
+        with np.errstate(invalid='ignore'):
+            if kind == POLE:
+                undefined = args == 0
+            elif kind == POSITIVE:
+                undefined = ~(args > 0)
+            elif kind == NON_NEGATIVE:
+                undefined = ~(args >= 0)
+            else:
+                undefined = (args < 0) & (args % 1 == 0)
+        results[undefined] = np.nan
+    return results
+
+
+def crosses_pole(domain, rows):
+    """
+    Return, for each interval between consecutive samples of an evaluated branch, if a pole lies within it,
+    so that lines are never drawn across an asymptote. Returns None if the branch has no poles.
+    """
+    crossed = None
+    for (kind, _), args in zip(domain, rows[1:]):
+        with np.errstate(invalid='ignore'):
+            if kind == POLE:
+                signs = np.sign(args)
+                crosses = (signs[:-1] != signs[1:]) & np.isfinite(args[:-1]) & np.isfinite(args[1:])
+            elif kind == FACTORIAL:
+                first = np.ceil(np.minimum(args[:-1], args[1:]))
+                crosses = (first <= np.maximum(args[:-1], args[1:])) & (first <= -1)
+            else:
+                continue
+        crossed = crosses if crossed is None else crossed | crosses
+    return crossed
+
+
+def compile_branch(symbol, exprs):
+    """
+    Compile a solved branch, followed by the constraints of its domain, into a numeric callable that evaluates them
+    all over a whole NumPy array in one call. Factorials are rewritten as gamma functions, reciprocal trigonometric
+    functions as reciprocals, and the real-root conditions are dropped, since only real values are ever substituted.
+    Returns None if the branch cannot be compiled. Compiled branches are shared process-wide, so re-sampling a known
+    expression costs nothing.
+    """
+    compiled = COMPILED.get((symbol, exprs))
+    if compiled is not COMPILED.MISSING:
+        return compiled
+    numeric = []
+    for expr in exprs:
+        expr = sympy.sympify(expr)
+        expr = expr.replace(sympy.factorial, lambda arg: sympy.gamma(arg + 1))
+        for function, reciprocal in RECIPROCALS.items():
+            expr = expr.replace(function, lambda arg: 1 / reciprocal(arg))
+        numeric.append(sympify(expr.replace(sympy.im, lambda arg: sympy.S.Zero)))
+    try:
+        compiled = symengine.Lambdify([symbol], numeric, real=True)
+    except (RuntimeError, TypeError, ValueError, SympifyError):
+        compiled = None
+    COMPILED.put((symbol, exprs), compiled)
+    return compiled
+
+
+def evaluate_branch(symbol, exprs, compiled, values):
+    """
+    Evaluate a branch and its constraints over an array of values, returning one row of results for each.
+    Complex and undefined results are returned as NaN. If the branch could not be compiled, fall back to
+    substituting each value symbolically.
+    """
+    if compiled is not None:
+        with np.errstate(all='ignore'):
+            return np.asarray(compiled(values), dtype=float).reshape(len(values), len(exprs)).T
+    results = np.full((len(exprs), len(values)), np.nan)
+    for row, expr in enumerate(exprs):
+        for index, value in enumerate(values.tolist()):
+            try:
+                result = symengine.Float(expr.xreplace({symbol: value}))
+                if result.is_real:
+                    results[row, index] = float(result)
+            except (RuntimeError, TypeError):
+                pass
+    return results
+
+
+def split_segments(valid, breaks=None):
+    """
+    Return the start and end indices of every run of at least two consecutive valid samples.
+    Runs are also split between any two samples marked in breaks, which has one entry per interval between samples.
+    """
+    joined = valid[:-1] & valid[1:]
+    if breaks is not None:
+        joined &= ~breaks
+    edges = np.diff(np.concatenate(([0], joined.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) + 1
+    return starts, ends
+
+
+def calculate(symbol, branches, bounds, value_bounds, pixels, y):
+    """
+    Sample every branch of a relation solved for one symbol over bounds, returning its continuous lines and whether
+    any part of it left value_bounds. Branches are the solutions of a relation as returned by Relation.get_branches,
+    with their roots already made real.
+    """
+
+    lines_to_draw = []
+    out_of_range = False
+
+    # Iterate through all the functions for Y
+    for expr in branches:
+        began = tracing.clock()
+        branch = str(expr) if tracing.enabled else None
+
+        # Adaptively sample Y, refining only where the curve would visibly deviate or leaves its domain
+        domain = branch_domain(symbol, expr)
+        exprs = (expr,) + tuple(constraint for _, constraint in domain)
+        compiled = compile_branch(symbol, exprs)
+        all_x, all_y_vals = adaptive_sample(
+            lambda values: mask_undefined(domain, evaluate_branch(symbol, exprs, compiled, values)),
+            bounds, value_bounds, pixels)
+
+        # Discard Y if it is undefined or complex, including factorials of negative integers
+        valid = np.isfinite(all_y_vals)
+
+        # Discard Y if it is not in the graph's range
+        with np.errstate(invalid='ignore'):
+            in_range = (all_y_vals >= value_bounds[0]) & (all_y_vals <= value_bounds[1])
+        if np.any(valid & ~in_range):
+            out_of_range = True
+        valid &= in_range
+
+        # Split the remaining points into continuous lines
+        breaks = crosses_pole(domain, evaluate_branch(symbol, exprs, compiled, all_x)) if len(domain) > 0 else None
+        starts, ends = split_segments(valid, breaks)
+        for start, end in zip(starts, ends):
+            x_vals, y_vals = all_x[start:end], all_y_vals[start:end]
+            lines_to_draw.append(np.column_stack((x_vals, y_vals) if y else (y_vals, x_vals)))
+        tracing.span('branch', began, args={'branch': branch, 'bounds': list(bounds), 'samples': len(all_x)})
+
+    return lines_to_draw, out_of_range
@@ -1,15 +1,17 @@
 import os
 import pygame
-import symengine
-import sympy
-import math
-from multiprocessing.pool import ThreadPool
-from symengine import Symbol, sympify, SympifyError
 from commons import get_current_path, render_text
+from calc.scheduler import submit
+from calc.tiles import needed_tiles, kind_holds, TileCache, Y_FUNCTION, X_FUNCTION
+from calc.lookup import PointIndex
+from calc.curves import join_curves
+from calc.cache import SOLUTIONS
+from calc.layers import Layer
+from calc.ticks import ticks, get_label_atlas
+from calc import profiler, tracing
 from widgets.slider import Slider
 from widgets.button import Button
 from widgets.textbox import Textbox
-from tkinter import messagebox
 from random import choice
 
 # RGB colour constants
@@ -47,59 +49,9 @@ LAVENDER = (150, 123, 182)
 COLOURS = [RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE, CYAN, MAGENTA, GRAY, BROWN, TURQUOISE, GOLD, INDIGO,
            SALMON, SEA_GREEN, SLATE_BLUE, OLIVE_GREEN, LIME_GREEN, SKY_BLUE, PINK, BEIGE, TAN, CORAL, LAVENDER]
 
-# Predefined factorial object for error checking
-FACTORIAL = sympify(sympy.sympify("factorial(x)"))
-FACTORIAL_Y = sympify(sympy.sympify("factorial(y)"))
-
 CurrentPath = get_current_path()
 
 
-def low_res_warning(x):
-    """Warn the user that a graph cannot be fully evaluated with a tkinter messagebox"""
-    all_graphs = "\n   • ".join(x)
-    warning = f"""The following graph(s) cannot be fully evaluated:\n   • {all_graphs}\nEvaluating at low resolution"""
-    messagebox.showwarning("Warning", warning)
-
-
-def multisolver(expression):
-    """
-    Recursively resolve an expression and replace all fractions with Rational objects.
-    This ensures any curve with an odd power renders correctly.
-    """
-    for index, sub_expr in enumerate(expression.args):
-        if type(sub_expr) == symengine.Pow:
-            if type(sub_expr.args[1]) == symengine.Rational:
-                num, den = sub_expr.args[1].get_num_den()
-                real_root = sympify(sympy.real_root(
-                    sympy.Pow(sub_expr.args[0], num), den))
-                expression = expression.replace(
-                    expression.args[index], real_root)
-        else:
-            expression = expression.replace(
-                sub_expr, multisolver(sub_expr))
-    return expression
-
-
-def factorial_checker(expression):
-    """
-    Recursively observe an expression to check for a factorial calculation.
-    """
-    if expression == FACTORIAL or expression == FACTORIAL_Y:
-        return True
-    elif type(expression) != tuple:
-        found = False
-        for i in expression.args:
-            found = factorial_checker(i) if not found else True
-        return found
-    elif FACTORIAL in expression.args or FACTORIAL_Y in expression.args:
-        return True
-    else:
-        try:
-            return factorial_checker(expression.args)
-        except AttributeError:
-            return False
-
-
 def resolution(func_domain, func_range):
     size_of_domain = abs(func_domain[1]-func_domain[0])
     size_of_range = abs(func_range[1]-func_range[0])
@@ -128,134 +80,21 @@ def resolution(func_domain, func_range):
     return x_resolution, y_resolution
 
 
-def calculate(symbol, expressions, all_x, all_y, y):
-    """To be used internally in the calculate_x_y function, minimising repetition of code"""
-
-    lines_to_draw = []
-    out_of_range = False
-
-    # Iterate through all the functions for Y
-    for expr in expressions.args:
-
-        # Recursively resolve if necessary
-        if type(expr) == symengine.Pow:
-            if type(expr.args[1]) == symengine.Rational:
-                num, den = expr.args[1].get_num_den()
-                real_root = sympify(
-                    sympy.real_root(sympy.Pow(expr.args[0], num), den))
-                expr = real_root
-            else:
-                expr = multisolver(expr)
-
-        points = []
-
-        # Iterate through X values
-        for x_val in all_x:
-
-            # Disallow factorial of negative integers from being calculated (prevent pygame segmentation fault)
-            if factorial_checker(expr):
-                if x_val < 0 and x_val % 1 == 0:
-                    if len(points) > 1:
-                        lines_to_draw.append(points)
-                    points = []
-                    continue
-
-            # Substitute current X into current function of Y
-            y_val = expr.xreplace({symbol: x_val})
-
-            # Attempt to numerically evaluate Y
-            try:
-                y_val = symengine.Float(y_val)
-                if math.isnan(float(y_val)):
-                    if len(points) > 1:
-                        lines_to_draw.append(points)
-                    points = []
-                    continue
-            except RuntimeError:
-                pass
-
-            # Discard Y if it is complex
-            if not y_val.is_real:
-                if len(points) > 1:
-                    lines_to_draw.append(points)
-                points = []
-                continue
-
-            # Discard Y if it is not in the graph's range
-            if y_val < all_y[0] or y_val > all_y[-1]:
-                out_of_range = True
-                if len(points) > 1:
-                    lines_to_draw.append(points)
-                points = []
-                continue
-
-            # Add Y to the current line
-            points.append((x_val, y_val) if y else (y_val, x_val))
-
-        # Add leftover lines
-        if len(points) > 1:
-            lines_to_draw.append(points)
-
-    return lines_to_draw, out_of_range
-
-
-def calculate_x_y(relation, all_x, all_y):
-    """
-    Create lists of all points to be drawn on a graph. If the graph cannot be solved by symengine's algorithms,
-    or if the solution requires complex numbers, then use an alternate solving method which is less accurate
-    and must render at a lower resolution (every 0.1 x instead of 0.01 x).
-    """
-    x_exprs, y_exprs = relation.f()
-
-    symbol_x = Symbol('x')
-    symbol_y = Symbol('y')
-
-    lines_to_draw, out_of_range = calculate(symbol_x, y_exprs, all_x, all_y, True)
-
-    # Get lines for when there are no solutions for Y (e.g. x=5)
-    if len(y_exprs.args) == 0:
-        lines_to_draw, out_of_range = calculate(symbol_y, x_exprs, all_y, all_x, False)
-
-    alternate_renders = []
-
-    # Iterately solve for g(x) = 0 if no solutions were possible through real function notation
-    if len(lines_to_draw) == 0 and not out_of_range:
-
-        # Only calculate if left-hand-side is different (has a relation) to right side
-        if relation.lhs != relation.rhs:
-            try:
-
-                # Rearrange for 0
-                ex = sympify(relation.lhs + " - " + relation.rhs)
-
-                x_resolution, y_resolution = resolution((all_x[0], all_x[-1]), (all_y[0], all_y[-1]))
-
-                # Add point if g(x) is close to zero
-                for x_val in all_x:
-                    if not (x_val * (x_resolution/10)).is_integer():
-                        continue
-                    for y_val in all_y:
-                        if not (y_val * (y_resolution/10)).is_integer():
-                            continue
-                        ans = ex.xreplace(
-                            {symbol_x: x_val, symbol_y: y_val})
-                        if ans.is_real and -0.1 <= ans <= 0.1:
-                            alternate_renders.append((x_val, y_val))
-            except (NotImplementedError, ValueError, SympifyError, TypeError):
-                pass
-
-    return lines_to_draw, alternate_renders
-
-
 class FakeGraph:
     """
     The fake graph structure is used to hold all the equations of another graph and be serialised,
     so that later on the equations can be re-used in another instance of Insidia.
+    Their colours and the domain and range they were graphed over are kept alongside them,
+    as well as the curves already calculated for them, so that they can be drawn again without being solved.
     """
 
-    def __init__(self, name, lines):
+    def __init__(self, name, lines, colours=None, func_domain=None, func_range=None, curves=None):
         self.name = name
         self.lines = lines
+        self.colours = colours
+        self.func_domain = func_domain
+        self.func_range = func_range
+        self.curves = curves
 
 
 class Graph:
@@ -272,6 +111,9 @@ class Graph:
     RESET_EVENT = pygame.USEREVENT + 3
     CLEAR_EVENT = pygame.USEREVENT + 4
 
+    # Maximum distance in pixels between the mouse and a point for its tooltip to show
+    TOOLTIP_TOLERANCE = 2
+
     mode: int
     size: tuple
     offset_x: int
@@ -279,6 +121,8 @@ class Graph:
     cache: dict
     last_surface: pygame.Surface | None
     viewing_surface: pygame.Surface
+    tooltip_points: list
+    version: int
     pos: tuple | None
     mouse_pos: tuple | None
     clicked: bool
@@ -287,9 +131,16 @@ class Graph:
     textboxes: list
     d_r_boxes: list
     lines: dict
-    alternate: dict
+    layers: dict
+    indexes: dict
+    drawn: dict
+    tiles: dict
+    kinds: dict
+    preloaded: dict
+    pending: dict
+    failed: set
+    completed: int
     used_colours: list
-    pool: ThreadPool
 
     # Initialise generic empty graph with default values
     def __init__(self, size, equations=0, clear=False) -> None:
@@ -301,6 +152,8 @@ class Graph:
         self.cache = {'func_domain': None, 'func_range': None,
                       'scale_x': None, 'scale_y': None}
         self.last_surface = None
+        self.tooltip_points = []
+        self.version = 0
         self.pos = None
         self.mouse_pos = None
         self.clicked = False
@@ -319,7 +172,15 @@ class Graph:
                           Textbox((60, 30), 18, "Y-Min", DARK_GREY, default="-10"),
                           Textbox((60, 30), 18, "Y-Max", DARK_GREY, default="10")]
         self.lines = {}
-        self.alternate = {}
+        self.layers = {}
+        self.indexes = {}
+        self.drawn = {}
+        self.tiles = {}
+        self.kinds = {}
+        self.preloaded = {}
+        self.pending = {}
+        self.failed = set()
+        self.completed = 0
         self.used_colours = []
         if equations != 0:
             i = 0
@@ -328,7 +189,6 @@ class Graph:
                 i += 1
         if clear:
             self.add_clear_button()
-        self.pool = ThreadPool(processes=1)
 
     # Extend the size of the graph to the size of the window, if needed.
     def extend(self, size_x) -> None:
@@ -338,10 +198,28 @@ class Graph:
     def get_d_r_boxes(self) -> list:
         return self.d_r_boxes
 
-    # Save current graph state for pickling
+    # Save current graph state for an Opus file
     def save(self, name):
         all_exprs = [i.get_original() for i in self.lines]
-        return FakeGraph(name, all_exprs)
+        all_colours = [list(i.get_colour()) for i in self.lines]
+        all_curves = []
+        for relation in self.lines:
+            if relation not in self.kinds or relation not in self.drawn:
+                continue
+            all_curves.append({'equation': relation.get_original(), 'expression': relation.get_expression(),
+                               'request': self.kinds[relation][0], 'kind': self.kinds[relation][1],
+                               'solutions': (relation.x_values, relation.y_values) if relation.is_solved() else None,
+                               'tiles': {tile: self.tiles[relation].get(tile) for tile in self.drawn[relation]
+                                         if tile in self.tiles[relation]}})
+        return FakeGraph(name, all_exprs, all_colours, self.cache.get('func_domain'), self.cache.get('func_range'),
+                         all_curves)
+
+    # Adopt the precomputed curves of a loaded Opus file, used once relations with the same equalities are graphed
+    def preload(self, records) -> None:
+        for expression, kind, request, solutions, tiles in records:
+            if solutions is not None:
+                SOLUTIONS.put(expression, solutions)
+            self.preloaded[expression] = (kind, request, tiles)
 
     # Generate a textbox with a random colour that hasn't been used before
     def add_textbox(self) -> None:
@@ -412,48 +290,133 @@ class Graph:
         for slider in self.sliders:
             slider.reset()
 
-    # Given a Relation and the scope of the graph, sketch the lines (if function-like), otherwise draw points
-    def sketch(self, all_x, all_y, relation, scale_x, scale_y, graph_surface, change) -> str | None:
-
-        # Get the centre of the graph
-        origin = ((self.size[0]/2) + self.offset_x, (self.size[1]/2) + self.offset_y)
-
-        should_return = False
+    # Queue the visible tiles of every relation that have not been calculated yet, without waiting for them
+    def calculate(self, func_domain, func_range, relations, viewport, scales) -> None:
+        request = (func_domain, func_range)
 
-        # If the relation has already been calculated, don't waste resources recalculating it
-        if (relation not in self.lines and relation not in self.alternate) or change:
-
-            should_return = True
-
-            # Asynchronously calculate X and Y values to prevent pygame freezing
-            async_result = self.pool.apply_async(calculate_x_y, (relation, all_x, all_y,))
-
-            lines_to_draw, alternate_renders = async_result.get()
+        # Cancel jobs that are out of date, and forget relations that are no longer graphed
+        for relation in list(self.pending):
+            if relation not in relations:
+                for future, _, _ in self.pending.pop(relation):
+                    future.cancel()
+                continue
+            for job in [job for job in self.pending[relation] if job[1] != request]:
+                job[0].cancel()
+                self.pending[relation].remove(job)
+        for cache in (self.lines, self.layers, self.indexes, self.drawn, self.tiles, self.kinds):
+            for relation in list(cache):
+                if relation not in relations:
+                    cache.pop(relation)
+        self.failed.intersection_update(relations)
 
-            self.lines[relation] = lines_to_draw
-            self.alternate[relation] = alternate_renders
+        for relation in relations:
+            if relation in self.failed:
+                continue
+            jobs = self.pending.setdefault(relation, [])
+
+            # Relations loaded from an Opus file start with the tiles that were saved with them
+            if relation not in self.tiles and relation.get_expression() in self.preloaded:
+                kind, saved_request, saved_tiles = self.preloaded.pop(relation.get_expression())
+                self.tiles[relation] = TileCache()
+                for tile in saved_tiles:
+                    self.tiles[relation].put(tile, saved_tiles[tile])
+                if saved_request == request:
+                    self.kinds[relation] = (request, kind)
+                solutions = SOLUTIONS.get(relation.get_expression())
+                if not relation.is_solved() and solutions is not SOLUTIONS.MISSING:
+                    relation.set_solutions(*solutions)
+            tiles = self.tiles.setdefault(relation, TileCache())
+
+            # Keep how the relation is plotted if the new domain and range cannot change it, so cached tiles are reused
+            if relation in self.kinds and self.kinds[relation][0] != request and \
+                    kind_holds(self.kinds[relation][1], self.kinds[relation][0], request):
+                self.kinds[relation] = (request, self.kinds[relation][1])
+
+            # If it is not yet known how the relation is plotted, let a worker decide and calculate what is visible
+            if relation not in self.kinds or self.kinds[relation][0] != request:
+                if len(jobs) == 0:
+                    jobs.append((submit((relation, func_domain, func_range, viewport, scales, None, None, tiles.keys())),
+                                 request, None))
+                continue
 
-        # Draw the cached values
-        if len(self.lines[relation]) == 0 and relation in self.alternate and len(self.alternate[relation]) > 0:
-            for point in self.alternate[relation]:
-                pygame.draw.circle(
-                    graph_surface, relation.get_colour(),
-                    ((point[0] * scale_x) + origin[0], origin[1] - (point[1] * scale_y)), 1)
-            # Given the Relation being drawn is new, return a string to send a warning message
-            if should_return:
-                return str(relation.get_original())
+            # Otherwise only queue the visible tiles that are neither calculated nor already queued
+            needed = needed_tiles(self.kinds[relation][1], func_domain, func_range, viewport, scales)
+            queued = set().union(*[job[2] for job in jobs if job[2] is not None])
+            missing = [tile for tile in needed if tile not in tiles and tile not in queued]
+            if len(missing) > 0:
+                jobs.append((submit((relation, func_domain, func_range, viewport, scales, self.kinds[relation][1], missing)),
+                             request, set(missing)))
+
+            # Until every visible tile has arrived, relations keep drawing their previous lines as a preview
+            if self.drawn.get(relation) != needed and all(tile in tiles for tile in needed):
+                self.lines[relation] = join_curves([tiles.get(tile) for tile in needed])
+                self.drawn[relation] = needed
+
+                # Index the points for tooltips, along x for functions of x, along y for functions of y
+                axis = {Y_FUNCTION: 0, X_FUNCTION: 1}.get(self.kinds[relation][1])
+                self.indexes[relation] = PointIndex(self.lines[relation], axis)
+
+    # Return if a relation could not be calculated
+    def has_failed(self, relation) -> bool:
+        return relation in self.failed
+
+    # Collect the tiles of any relations that have finished calculating. Returns if any have.
+    def poll(self) -> bool:
+        finished = 0
+        for relation, jobs in self.pending.items():
+            for job in [job for job in jobs if job[0].done()]:
+                jobs.remove(job)
+
+                # A relation whose calculation raised an error is not drawn, and is not calculated again.
+                # It still counts as finished, so the graph is redrawn without the pending label.
+                try:
+                    calculated, kind, solved, timings = job[0].result()
+                except Exception:
+                    self.failed.add(relation)
+                    for future, _, _ in jobs:
+                        future.cancel()
+                    jobs.clear()
+                    finished += 1
+                    break
+                relation.set_solutions(*solved.f())
+                if profiler.enabled:
+                    profiler.add_relation(relation.get_original(), timings['solve'],
+                                          sum(len(curve.points) for curve in calculated.values()))
+                tracing.extend(timings.get('spans'))
+                self.kinds[relation] = (job[1], kind)
+                for tile in calculated:
+                    self.tiles[relation].put(tile, calculated[tile])
+                finished += 1
+        if finished > 0:
+            self.completed += 1
+        return finished > 0
+
+    # Given a calculated Relation, sketch its lines by blitting its layer, rendering the layer again only if needed
+    def sketch(self, relation, scale_x, scale_y, graph_surface) -> None:
 
-        for line in self.lines[relation]:
-            pygame.draw.aalines(graph_surface, relation.get_colour(), False, [((point[0] * scale_x) + origin[0], origin[1] - (point[1] * scale_y)) for point in line], 2)
+        # Get the centre of the graph
+        origin = ((self.size[0]/2) + self.offset_x, (self.size[1]/2) + self.offset_y)
 
-        return None
+        # Draw the cached values, if the relation has been calculated
+        if relation not in self.lines:
+            return
+        curve, colour, scales = self.lines[relation], relation.get_colour(), (scale_x, scale_y)
+        layer = self.layers.get(relation)
+        if layer is None or not layer.fits(curve, colour, scales, origin, self.size):
+            layer = Layer(curve, colour, scales, origin, self.size, BACKGROUND_GREY)
+            self.layers[relation] = layer
+        layer.blit(graph_surface, origin)
 
     # Return a pygame surface with a detailed graph, showing axis, intersects, and relations
     def create(self, func_domain, func_range, relations, offset, scale_x=25, scale_y=25) -> pygame.Surface:
+        start = profiler.clock()
 
         # Get the centre of the graph
         origin = ((self.size[0]/2) + self.offset_x, (self.size[1]/2) + self.offset_y)
 
+        # Composite any relations that have finished calculating since the last frame
+        self.poll()
+
         # If the mouse is over a point, append a tooltip for that point
         tooltips = []
         if self.mode == self.TOOLTIP:
@@ -463,30 +426,41 @@ class Graph:
             mouse_y = pygame.mouse.get_pos()[1]
             relative_x = mouse_x - self.pos[0]
             relative_y = mouse_y - self.pos[1]
-            x_val = round((relative_x - origin[0]) / scale_x, 2)
-            y_val = round((origin[1] - relative_y) / scale_y, 2)
+            x_val = (relative_x - origin[0]) / scale_x
+            y_val = (origin[1] - relative_y) / scale_y
 
             # If the relative values are within the graph, generate a tooltip
             if 0 <= relative_x <= self.size[0] and 0 <= relative_y <= self.size[1]:
-                for eq in self.lines:
-                    for line in self.lines[eq]:
-                        for point in line:
-                            # Only follow the relative X if the graph is dependant on Y, otherwise vice versa.
-                            y_dependant = False if type(point[0]) != float else True
-                            x_display = round(float(point[0]), 2)
-                            y_display = round(float(point[1]), 2)
-                            if (y_dependant and point[0] == x_val) or (not y_dependant and point[1] == y_val):
-                                tooltips.append(
-                                    [float(point[0]), float(point[1]),
-                                     render_text("Line: --------", 14, color=eq.get_colour()),
-                                     render_text("X: " + str(x_display), 14, color=BLACK),
-                                     render_text("Y: " + str(y_display), 14, color=BLACK), y_dependant
-                                     ])
-                                continue
+                for eq in self.indexes:
+                    # Only follow the relative X if the graph is dependant on Y, otherwise vice versa.
+                    y_dependant = self.indexes[eq].axis != 1
+                    # Show the sample of each line closest to the mouse, if it is within a few pixels
+                    for point in self.indexes[eq].nearest((x_val, y_val), (scale_x, scale_y), self.TOOLTIP_TOLERANCE):
+                        x_display = round(point[0], 2)
+                        y_display = round(point[1], 2)
+                        tooltips.append(
+                            [point[0], point[1],
+                             render_text("Line: --------", 14, color=eq.get_colour()),
+                             render_text("X: " + str(x_display), 14, color=BLACK),
+                             render_text("Y: " + str(y_display), 14, color=BLACK), y_dependant
+                             ])
 
         # Use cached graph if it hasn't changed. Otherwise, recalculate necessary changes
         if self.cache == {'func_domain': func_domain, 'func_range': func_range, 'scale_x': scale_x, 'scale_y': scale_y,
-                          'offset_x': self.offset_x, 'offset_y': self.offset_y, 'relations': relations, 'sidebar_offset': offset}:
+                          'offset_x': self.offset_x, 'offset_y': self.offset_y, 'relations': relations, 'sidebar_offset': offset,
+                          'completed': self.completed}:
+            # Reuse the surface from the last frame if the same tooltips are shown
+            tooltip_points = [(tooltip[0], tooltip[1]) for tooltip in tooltips]
+            if tooltip_points == self.tooltip_points:
+                profiler.add('graph_hit', start)
+                return self.viewing_surface
+            self.tooltip_points = tooltip_points
+            self.version += 1
+            if len(tooltips) == 0:
+                self.viewing_surface = self.last_surface
+                profiler.add('graph_hit', start)
+                return self.last_surface
+
             # Create a copy of the cached graph to draw on
             surf = self.last_surface.copy()
 
@@ -518,6 +492,8 @@ class Graph:
                                        15 + x_accumulated, point_coordinate[1] + 55 + y_accumulated))
                 prev_rects.append(rect)
 
+            self.viewing_surface = surf
+            profiler.add('graph_hit', start)
             return surf
 
         # Create surface and fill background
@@ -537,114 +513,48 @@ class Graph:
         graph_surface.blit(render_text("0", 10, color=DARK_GREY),
                            (origin[0] - 10, origin[1] + 4))
 
-        # Based on the scope of values, choose an appropriate resolution to improve efficiency
+        # Based on the scope of values, choose the finest spacing allowed between ticks
         x_resolution, y_resolution = resolution(func_domain, func_range)
-
-        viewport = (-origin[0], origin[1])
-        viewport_max = (((self.size[0] / 2) - self.offset_x), (self.offset_y - (self.size[1] / 2)))
-
-        # Get all possible values for the graphs domain and range
-        all_x = [i / x_resolution for i in range(func_domain[0] * x_resolution, (func_domain[1] * x_resolution) + 1)]
-        all_y = [i / x_resolution for i in range(func_range[0] * x_resolution, (func_range[1] * x_resolution) + 1)]
-
-        all_vp_x = [i / x_resolution for i in range((round(viewport[0]/scale_x) * x_resolution), (round(viewport_max[0]/scale_x) * x_resolution) + 1)]
-        all_vp_y = [i / y_resolution for i in range(round(viewport_max[1]/scale_y) * y_resolution, (round(viewport[1]/scale_y) * y_resolution) + 1)]
-
-        # Draw X axis coordinates
-        for num in all_vp_x:
-            # Draw multiples of 50 if the scale is very little
-            if scale_x == 1 and num % 50 != 0:
-                continue
-            # Draw multiples of 20 if the scale is very little
-            if scale_x < 5 and num % 20 != 0:
-                continue
-            # Draw multiples of 5 if the scale is moderately low
-            if scale_x < 15 and num % 5 != 0:
-                continue
-            # Draw all integers
-            if scale_x <= 75 and num % 1 != 0:
-                continue
-            # Draw half numbers
-            if scale_x <= 175 and num % 0.5 != 0:
-                continue
-            # Draw every 0.1
-            if scale_x <= 400 and num*10 % 1 != 0:
-                continue
-            # Draw all numbers that can currently be seen
-            if num > 0:
-                coordinate = (origin[0] + (scale_x * num), origin[1])
-                pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
-                graph_surface.blit(render_text(
-                    str(num), 10, color=DARK_GREY), (coordinate[0] - 2, coordinate[1] + 7))
-            if num < 0:
-                coordinate = (origin[0] - (scale_x * abs(num)), origin[1])
-                pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
-                graph_surface.blit(render_text(
-                    str(num), 10, color=DARK_GREY), (coordinate[0] - 6, coordinate[1] + 7))
-
-        # Draw Y axis coordinates
-        for num in all_vp_y:
-            # Draw multiples of 100 if the scale is very little
-            if scale_y < 2 and num % 50 != 0:
-                continue
-            # Draw multiples of 20 if the scale is very little
-            if scale_y < 5 and num % 20 != 0:
-                continue
-            # Draw multiples of 5 if the scale is moderately low
-            if scale_y < 15 and num % 5 != 0:
-                continue
-            # Draw all integers
-            if scale_y <= 75 and num % 1 != 0:
-                continue
-            # Draw half numbers
-            if scale_y <= 175 and num % 0.5 != 0:
-                continue
-            # Draw every 0.1
-            if scale_y <= 400 and num*10 % 1 != 0:
-                continue
-            # Draw all numbers that can currently be seen
+        labels = get_label_atlas(10, DARK_GREY)
+
+        # Draw X axis coordinates, generating only the ticks that can currently be seen
+        for num, label in ticks(((0 - origin[0]) / scale_x, (self.size[0] - origin[0]) / scale_x), scale_x, (1, x_resolution)):
+            coordinate = (origin[0] + (scale_x * num), origin[1])
+            pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
+            labels.blit(graph_surface, label, (coordinate[0] - (2 if num > 0 else 6), coordinate[1] + 7))
+
+        # Draw Y axis coordinates, generating only the ticks that can currently be seen
+        for num, label in ticks(((origin[1] - self.size[1]) / scale_y, origin[1] / scale_y), scale_y, (1, y_resolution)):
+            coordinate = (origin[0], origin[1] - (scale_y * num))
+            pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
             if num > 0:
-                coordinate = (origin[0], origin[1] - (scale_y * num))
-                pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
-                text = render_text(str(num), 10, color=DARK_GREY)
-                graph_surface.blit(
-                    text, (coordinate[0] - 12 - text.get_width(), coordinate[1] - 5))
-            if num < 0:
-                coordinate = (origin[0], origin[1] + (scale_y * abs(num)))
-                pygame.draw.circle(graph_surface, BLACK, coordinate, 3)
-                graph_surface.blit(render_text(
-                    str(num), 10, color=DARK_GREY), (coordinate[0] + 8, coordinate[1] - 5))
-
-        # Empty the cached points if the relations have changed or don't exist yet
-        if 'relations' not in self.cache or self.cache['relations'] != relations:
-            self.lines = {}
-            self.alternate = {}
-
-        # If the domain and range has changed, force regenerate the relation
-        changed_d_r = False
-        if self.cache['func_domain'] != func_domain or self.cache['func_range'] != func_range:
-            changed_d_r = True
-
-        # Sketch relations and note if they are alternatively rendered
-        low_res = []
+                labels.blit(graph_surface, label, (coordinate[0] - 12 - labels.width(label), coordinate[1] - 5))
+            else:
+                labels.blit(graph_surface, label, (coordinate[0] + 8, coordinate[1] - 5))
+
+        # Queue the visible parts of all relations at once, then sketch those that are ready
+        viewport = ((-origin[0] / scale_x, (self.size[0] - origin[0]) / scale_x),
+                    ((origin[1] - self.size[1]) / scale_y, origin[1] / scale_y))
+        self.calculate(func_domain, func_range, relations, viewport, (scale_x, scale_y))
         for relation in relations:
-            sketch = self.sketch(all_x, all_y,
-                                 relation, scale_x, scale_y, graph_surface, changed_d_r)
-            if sketch is not None:
-                low_res.append(sketch)
+            self.sketch(relation, scale_x, scale_y, graph_surface)
 
-        # Send a low resolution warning containing all the low-res graphs
-        if len(low_res) > 0:
-            low_res_warning(low_res)
+        # Let the user know that more lines are on their way
+        if any(len(jobs) > 0 for jobs in self.pending.values()):
+            graph_surface.blit(render_text("Calculating...", 12, color=DARK_GREY), (8, 6))
 
         # Cache the last graphed domain and range, scales, offsets and relations
         self.cache = {'func_domain': func_domain, 'func_range': func_range, 'scale_x': scale_x, 'scale_y': scale_y,
-                      'offset_x': self.offset_x, 'offset_y': self.offset_y, 'relations': relations, 'sidebar_offset': offset}
+                      'offset_x': self.offset_x, 'offset_y': self.offset_y, 'relations': relations, 'sidebar_offset': offset,
+                      'completed': self.completed}
 
         # Cache the last graphed surfaces
         self.last_surface = graph_surface
         self.viewing_surface = graph_surface
+        self.tooltip_points = []
+        self.version += 1
 
+        profiler.add('graph_miss', start)
         return graph_surface
 
     # Check for any clicks on the graph, its buttons, equation inputs and sliders
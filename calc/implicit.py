@@ -0,0 +1,174 @@
+import math
+import numpy as np
+import symengine
+from collections import defaultdict
+from symengine import Symbol, sympify, SympifyError
+from calc.cache import COMPILED
+
+# Pixels covered by each cell of the initial grid
+CELL_PIXELS = 8
+
+# Number of times a cell containing a sign change is split into quarters. 8px / 2^3 gives 1px cells.
+REFINE_LEVELS = 3
+
+# Marching squares lookup of which cell edges each case joins. Corners are numbered anticlockwise from the
+# bottom left (0) and edges are bottom (0), right (1), top (2) and left (3). Cases 5 and 10 are saddles,
+# for which SADDLES holds the alternative used when the cell centre has the opposite sign.
+SEGMENTS = [[], [(3, 0)], [(0, 1)], [(3, 1)], [(1, 2)], [(0, 1), (2, 3)], [(0, 2)], [(2, 3)],
+            [(2, 3)], [(0, 2)], [(3, 0), (1, 2)], [(1, 2)], [(1, 3)], [(0, 1)], [(3, 0)], []]
+SADDLES = {5: [(3, 0), (1, 2)], 10: [(0, 1), (2, 3)]}
+
+
+def compile_implicit(expr):
+    """Compile g(x, y) into a numeric callable, shared process-wide. Returns None if it cannot be compiled."""
+    symbols = (Symbol('x'), Symbol('y'))
+    compiled = COMPILED.get((symbols, expr))
+    if compiled is not COMPILED.MISSING:
+        return compiled
+    try:
+        compiled = symengine.Lambdify(list(symbols), [expr], real=True)
+    except (RuntimeError, TypeError, ValueError, SympifyError):
+        compiled = None
+    COMPILED.put((symbols, expr), compiled)
+    return compiled
+
+
+def evaluate_implicit(expr, compiled, x_vals, y_vals):
+    """Evaluate g(x, y) at every pair of values. Complex and undefined results are returned as NaN."""
+    if len(x_vals) == 0:
+        return np.empty(0)
+    if compiled is not None:
+        with np.errstate(all='ignore'):
+            return np.asarray(compiled(np.column_stack([x_vals, y_vals])), dtype=float).reshape(-1)
+    symbol_x, symbol_y = Symbol('x'), Symbol('y')
+    results = np.full(len(x_vals), np.nan)
+    for index, (x_val, y_val) in enumerate(zip(x_vals.tolist(), y_vals.tolist())):
+        try:
+            result = symengine.Float(expr.xreplace({symbol_x: x_val, symbol_y: y_val}))
+            if result.is_real:
+                results[index] = float(result)
+        except (RuntimeError, TypeError):
+            pass
+    return results
+
+
+def crosses_zero(corners):
+    """Return which cells have corner values of both signs (or a zero), ignoring cells that are not defined."""
+    finite = np.all(np.isfinite(corners), axis=0)
+    with np.errstate(invalid='ignore'):
+        return finite & (np.min(corners, axis=0) <= 0) & (np.max(corners, axis=0) >= 0)
+
+
+def join_segments(keys, points):
+    """
+    Join segments that share an edge into polylines, returned as (n, 2) arrays. Keys holds the pair of edge
+    identifiers of each segment, and points maps each edge identifier to the position where the curve crosses it.
+    """
+    neighbours = defaultdict(list)
+    for index, (start, end) in enumerate(keys):
+        neighbours[start].append(index)
+        neighbours[end].append(index)
+
+    used = [False] * len(keys)
+    lines = []
+    for index, (start, end) in enumerate(keys):
+        if used[index]:
+            continue
+        used[index] = True
+        chain = [start, end]
+
+        # Walk forwards from the end of the chain, then backwards from its start
+        for _ in range(2):
+            while True:
+                following = [i for i in neighbours[chain[-1]] if not used[i]]
+                if len(following) == 0:
+                    break
+                used[following[0]] = True
+                a, b = keys[following[0]]
+                chain.append(b if a == chain[-1] else a)
+            chain.reverse()
+
+        lines.append(np.array([points[key] for key in chain]))
+    return lines
+
+
+def contour(relation, func_domain, func_range, size):
+    """
+    Trace the curve g(x, y) = 0 of a relation that cannot be written as a function of x or y.
+    g is evaluated over a coarse grid, cells containing a sign change are refined as a quadtree,
+    and marching squares extracts the curve from the finest cells as connected polylines.
+    """
+    # An equation that is always true or always false has no curve to trace
+    if not relation.get_expression().is_Equality:
+        return []
+    lhs, rhs = relation.get_expression().args
+    expr = sympify(lhs - rhs)
+    compiled = compile_implicit(expr)
+
+    # Cells are addressed on an integer lattice at the finest level, so shared corners evaluate identically
+    columns = math.ceil(size[0] / CELL_PIXELS)
+    rows = math.ceil(size[1] / CELL_PIXELS)
+    cell = 2 ** REFINE_LEVELS
+    step_x = (func_domain[1] - func_domain[0]) / (columns * cell)
+    step_y = (func_range[1] - func_range[0]) / (rows * cell)
+
+    def g(lattice_x, lattice_y):
+        return evaluate_implicit(expr, compiled, func_domain[0] + lattice_x * step_x, func_range[0] + lattice_y * step_y)
+
+    # Evaluate the coarse grid once and find the cells the curve passes through
+    nodes_x, nodes_y = np.meshgrid(np.arange(columns + 1) * cell, np.arange(rows + 1) * cell)
+    grid = g(nodes_x.ravel(), nodes_y.ravel()).reshape(rows + 1, columns + 1)
+    corners = np.stack([grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(), grid[1:, 1:].ravel(), grid[1:, :-1].ravel()])
+    cells_x, cells_y = nodes_x[:-1, :-1].ravel(), nodes_y[:-1, :-1].ravel()
+    active = crosses_zero(corners)
+    cells_x, cells_y, corners = cells_x[active], cells_y[active], corners[:, active]
+    if len(cells_x) == 0:
+        return []
+
+    # Split every active cell into quarters, keeping only the quarters the curve still passes through
+    for _ in range(REFINE_LEVELS):
+        cell //= 2
+        cells_x = np.concatenate([cells_x, cells_x + cell, cells_x + cell, cells_x])
+        cells_y = np.concatenate([cells_y, cells_y, cells_y + cell, cells_y + cell])
+        corners = np.stack([g(cells_x, cells_y), g(cells_x + cell, cells_y),
+                            g(cells_x + cell, cells_y + cell), g(cells_x, cells_y + cell)])
+        active = crosses_zero(corners)
+        cells_x, cells_y, corners = cells_x[active], cells_y[active], corners[:, active]
+        if len(cells_x) == 0:
+            return []
+
+    # Reject cells straddling a pole rather than a root, where the centre is larger than every corner
+    centres = g(cells_x + 0.5, cells_y + 0.5)
+    with np.errstate(invalid='ignore'):
+        keep = np.isfinite(centres) & (np.abs(centres) <= np.max(np.abs(corners), axis=0))
+    cells_x, cells_y, corners, centres = cells_x[keep], cells_y[keep], corners[:, keep], centres[keep]
+
+    # Find where the curve crosses each edge of each cell by linear interpolation along the edge
+    edge_corners = [(0, 1), (1, 2), (3, 2), (0, 3)]
+    edge_offsets = [(0, 0, 0), (1, 0, 1), (0, 1, 0), (0, 0, 1)]
+    crossings_x, crossings_y, edge_keys = [], [], []
+    for (a, b), (dx, dy, vertical) in zip(edge_corners, edge_offsets):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.nan_to_num(corners[a] / (corners[a] - corners[b]), nan=0.5), 0, 1)
+        crossings_x.append(func_domain[0] + (cells_x + (t if not vertical else 0) + dx) * step_x)
+        crossings_y.append(func_range[0] + (cells_y + (t if vertical else 0) + dy) * step_y)
+        edge_keys.append(((cells_y + dy) * (columns * 2 ** REFINE_LEVELS + 1) + cells_x + dx) * 2 + vertical)
+
+    # Look up the segments of each cell with marching squares
+    cases = ((corners[0] > 0) * 1 + (corners[1] > 0) * 2 + (corners[2] > 0) * 4 + (corners[3] > 0) * 8).tolist()
+    centre_positive = (centres > 0).tolist()
+    crossings_x = np.stack(crossings_x).T.tolist()
+    crossings_y = np.stack(crossings_y).T.tolist()
+    edge_keys = np.stack(edge_keys).T.tolist()
+
+    keys = []
+    points = {}
+    for index, case in enumerate(cases):
+        segments = SADDLES[case] if case in SADDLES and not centre_positive[index] else SEGMENTS[case]
+        for a, b in segments:
+            key_a, key_b = edge_keys[index][a], edge_keys[index][b]
+            points[key_a] = (crossings_x[index][a], crossings_y[index][a])
+            points[key_b] = (crossings_x[index][b], crossings_y[index][b])
+            keys.append((key_a, key_b))
+
+    return join_segments(keys, points)
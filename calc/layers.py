@@ -0,0 +1,58 @@
+import pygame
+
+# Extra area rendered around the graph on each side, as a fraction of its size, so panning can reuse a layer
+LAYER_MARGIN = 0.5
+
+
+def transform(curve, scales, origin):
+    """
+    Map a curve of graph values to pixel positions with a single affine transform over every point at once.
+    The y axis is flipped, since pixel rows increase downwards.
+    """
+    return curve.transformed((scales[0], -scales[1]), origin)
+
+
+class Layer:
+    """
+    The layer structure holds the curve of one relation pre-rendered at one scale, on a surface larger than the graph.
+    Panning only moves where the layer is blitted, so it is redrawn only when the scale, curve or colour change,
+    or when the graph is panned beyond its margin.
+    """
+    surface: pygame.Surface
+    curve: object
+    colour: tuple
+    scales: tuple
+    origin: tuple
+    position: tuple
+
+    # Render a curve at the given scales, covering the graph and a margin around it
+    def __init__(self, curve, colour, scales, origin, size, background) -> None:
+        self.curve = curve
+        self.colour = colour
+        self.scales = scales
+        self.origin = origin
+        self.position = (-round(size[0] * LAYER_MARGIN), -round(size[1] * LAYER_MARGIN))
+
+        # Anti-aliased edges blend into the graph's background colour, which is then keyed out
+        self.surface = pygame.Surface((size[0] - 2 * self.position[0], size[1] - 2 * self.position[1]))
+        self.surface.fill(background)
+        self.surface.set_colorkey(background)
+        for line in transform(curve, scales, (origin[0] - self.position[0], origin[1] - self.position[1])):
+            if len(line) > 1:
+                pygame.draw.aalines(self.surface, colour, False, line.tolist(), 2)
+
+    # Return where the layer is blitted once the graph's origin has moved
+    def get_position(self, origin) -> tuple:
+        return (self.position[0] + origin[0] - self.origin[0], self.position[1] + origin[1] - self.origin[1])
+
+    # Return if the layer can still be blitted as is, instead of being rendered again
+    def fits(self, curve, colour, scales, origin, size) -> bool:
+        if curve is not self.curve or colour != self.colour or scales != self.scales:
+            return False
+        left, top = self.get_position(origin)
+        return left <= 0 and top <= 0 and left + self.surface.get_width() >= size[0] and \
+            top + self.surface.get_height() >= size[1]
+
+    # Draw the layer onto a graph surface
+    def blit(self, graph_surface, origin) -> None:
+        graph_surface.blit(self.surface, self.get_position(origin))
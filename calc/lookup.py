@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class PointIndex:
+    """
+    The point index structure answers nearest point queries over the curve of one relation.
+    Every point is sorted along one axis, so a query only bisects to the points within the tolerance of the mouse.
+    Functions of x are searched along x and functions of y along y. Implicit curves are searched along x,
+    and the resulting strip is filtered by the distance in both axes.
+    """
+    axis: int | None
+    keys: np.ndarray
+    points: np.ndarray
+    line_ids: np.ndarray
+
+    # Build the index of a relation's curve, sorted along an axis, or along x for implicit curves (axis None)
+    def __init__(self, curve, axis) -> None:
+        self.axis = axis
+        order = np.argsort(curve.points[:, axis if axis is not None else 0], kind='stable')
+        self.points = curve.points[order]
+        self.line_ids = curve.line_ids()[order]
+        self.keys = self.points[:, axis if axis is not None else 0]
+
+    # Return the point of each line closest to a position, if it is within tolerance pixels at the given scales
+    def nearest(self, position, scales, tolerance) -> list:
+        axis = self.axis if self.axis is not None else 0
+        width = tolerance / scales[axis]
+        start = np.searchsorted(self.keys, position[axis] - width, side='left')
+        end = np.searchsorted(self.keys, position[axis] + width, side='right')
+        points, line_ids = self.points[start:end], self.line_ids[start:end]
+
+        # Measure the distance in pixels, along the indexed axis or in both for implicit curves
+        if self.axis is not None:
+            distances = np.abs(points[:, axis] - position[axis]) * scales[axis]
+        else:
+            distances = np.hypot((points[:, 0] - position[0]) * scales[0], (points[:, 1] - position[1]) * scales[1])
+        close = distances <= tolerance
+        points, line_ids, distances = points[close], line_ids[close], distances[close]
+
+        # Keep the closest point of each line
+        order = np.lexsort((distances, line_ids))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = line_ids[order][1:] != line_ids[order][:-1]
+
+        # Lines split at a tile edge both hold the point on the edge, which is only shown once
+        return list(dict.fromkeys((float(x), float(y)) for x, y in points[order][first]))
@@ -0,0 +1,346 @@
+import io
+import os
+import json
+import struct
+import hashlib
+import sympy
+import pygame
+import numpy as np
+from symengine import sympify
+from sympy import sympify as sympyify
+from calc.graphing import FakeGraph
+from calc.curves import Curve
+from calc.relations import Relation, RelationError, is_safe_equation
+
+# Every Opus file begins with the magic bytes, the format version and the length of its manifest
+MAGIC = b'OPUS'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+# Version of the precomputed curve section. Changing it invalidates every stored expression hash.
+CURVES_VERSION = 1
+
+# The directory index, listing the manifest of every Opus file so that they can be shown without being opened
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 2
+
+
+# Opus files were once pickled graphs, and pickled data begins with this opcode
+PICKLE_PROTOCOL = b'\x80'
+
+
+class OpusError(Exception):
+    """Raised if a file is not a valid Opus file of a supported version."""
+    pass
+
+
+class LegacyOpusError(OpusError):
+    """Raised if a file was saved in the old pickled format, which is not loaded as unpickling can execute code."""
+    pass
+
+
+# Sympy classes that stored expressions may be rebuilt from, keyed by class name, created the first time they are needed
+classes = {}
+
+
+def get_classes() -> dict:
+    """Return every sympy class that an expression tree may contain, keyed by its class name."""
+    if len(classes) == 0:
+        for name in dir(sympy):
+            attribute = getattr(sympy, name)
+            if isinstance(attribute, type) and issubclass(attribute, sympy.Basic):
+                classes[attribute.__name__] = attribute
+        classes['ExprCondPair'] = sympy.functions.elementary.piecewise.ExprCondPair
+    return classes
+
+
+def encode_expression(expr) -> list:
+    """
+    Encode a sympy expression as a tree of JSON lists, which can be decoded without evaluating any code.
+    Raises ValueError if the expression contains anything that cannot be rebuilt.
+    """
+    if isinstance(expr, sympy.Dummy):
+        return ['Dummy', expr.name, expr.dummy_index]
+    if isinstance(expr, sympy.Symbol):
+        return ['Symbol', expr.name]
+    if isinstance(expr, sympy.Integer):
+        return ['Integer', str(expr)]
+    if isinstance(expr, sympy.Rational):
+        return ['Rational', str(expr.p), str(expr.q)]
+    if isinstance(expr, sympy.Float):
+        return ['Float', repr(float(expr))]
+    name = type(expr).__name__
+    if len(expr.args) == 0:
+        if getattr(sympy.S, name, None) == expr:
+            return ['S', name]
+        raise ValueError
+    if get_classes().get(name) is not type(expr):
+        raise ValueError
+    return [name] + [encode_expression(arg) for arg in expr.args]
+
+
+def decode_expression(tree, dummies=None):
+    """Rebuild a sympy expression from a tree made by encode_expression. Raises ValueError if it is not valid."""
+    dummies = {} if dummies is None else dummies
+    name = tree[0]
+    if name == 'Dummy':
+        return dummies.setdefault((tree[1], tree[2]), sympy.Dummy(tree[1]))
+    if name == 'Symbol':
+        return sympy.Symbol(tree[1])
+    if name == 'Integer':
+        return sympy.Integer(int(tree[1]))
+    if name == 'Rational':
+        return sympy.Rational(int(tree[1]), int(tree[2]))
+    if name == 'Float':
+        return sympy.Float(float(tree[1]))
+    if name == 'S':
+        if not isinstance(getattr(sympy.S, tree[1], None), sympy.Basic):
+            raise ValueError
+        return getattr(sympy.S, tree[1])
+    if name not in get_classes():
+        raise ValueError
+    return get_classes()[name](*[decode_expression(arg, dummies) for arg in tree[1:]])
+
+
+def expression_hash(equation) -> str:
+    """Return the hash that ties stored curves to the canonical form of the equality they were calculated from."""
+    return hashlib.sha256(f'{CURVES_VERSION}:{equation}'.encode('utf-8')).hexdigest()
+
+
+def to_tuple(value):
+    """Convert nested JSON lists back into the nested tuples used as tile keys."""
+    return tuple(to_tuple(item) for item in value) if isinstance(value, list) else value
+
+
+def encode_solutions(solutions):
+    """Encode the solved branches of a relation as expression trees, or return None if they cannot be encoded."""
+    try:
+        return [encode_expression(sympyify(values)) for values in solutions]
+    except (TypeError, ValueError, AttributeError, RuntimeError, sympy.SympifyError):
+        return None
+
+
+def decode_solutions(encoded):
+    """Rebuild solved branches encoded by encode_solutions, or return None if they were not stored or are not valid."""
+    try:
+        return None if encoded is None else tuple(sympify(decode_expression(values)) for values in encoded)
+    except (TypeError, ValueError, IndexError, AttributeError, RuntimeError, sympy.SympifyError):
+        return None
+
+
+def encode_curves(curves) -> bytes:
+    """
+    Pack the precomputed curves of a fake graph into a compressed section. Each relation records its
+    expression hash, how it is plotted, its solved branches if they could be encoded, and its tiles.
+    Metadata is stored as a JSON byte array beside the point arrays, so the section loads without pickle.
+    """
+    arrays = {}
+    relations = []
+    for i, record in enumerate(curves):
+        solutions = encode_solutions(record['solutions'])
+        tiles = []
+        for j, (tile, curve) in enumerate(record['tiles'].items()):
+            arrays[f'{i}_{j}_points'] = curve.points
+            arrays[f'{i}_{j}_offsets'] = curve.offsets
+            tiles.append(tile)
+        relations.append({'equation': record['equation'], 'hash': expression_hash(record['expression']),
+                          'kind': record['kind'], 'request': record['request'], 'solutions': solutions, 'tiles': tiles})
+    arrays['meta'] = np.frombuffer(json.dumps(relations).encode('utf-8'), dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def write_opus(path, graph, thumbnail=None) -> dict:
+    """
+    Write a fake graph to an Opus file, with its precomputed curves and an optional thumbnail surface stored as
+    a PNG after the manifest. The manifest is UTF-8 JSON, so loading a file never executes any of its contents.
+    Returns the manifest.
+    """
+    sections = b''
+    manifest = {'name': graph.name, 'equations': list(graph.lines), 'colours': graph.colours,
+                'domain': graph.func_domain, 'range': graph.func_range, 'thumbnail': None, 'curves': None}
+    if graph.curves:
+        encoded = encode_curves(graph.curves)
+        manifest['curves'] = [len(sections), len(encoded)]
+        sections += encoded
+    if thumbnail is not None:
+        buffer = io.BytesIO()
+        pygame.image.save(thumbnail, buffer, 'thumbnail.png')
+        manifest['thumbnail'] = [len(sections), len(buffer.getvalue())]
+        sections += buffer.getvalue()
+
+    encoded = json.dumps(manifest).encode('utf-8')
+
+    # Write beside the destination first, so a failed save never leaves a partial file behind
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        f.write(sections)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def is_safe_manifest(manifest) -> bool:
+    """Return if every equation of a manifest is safe to parse, as they are parsed when the graph is loaded."""
+    return (isinstance(manifest, dict) and isinstance(manifest.get('equations'), list)
+            and all(is_safe_equation(equation) for equation in manifest['equations']))
+
+
+def read_header(f) -> tuple:
+    """Read the manifest of an open Opus file. Returns the manifest and the offset its sections start at."""
+    header = f.read(HEADER.size)
+    if header[:1] == PICKLE_PROTOCOL:
+        raise LegacyOpusError
+    if len(header) != HEADER.size:
+        raise OpusError
+    magic, version, length = HEADER.unpack(header)
+    if magic != MAGIC or version > VERSION:
+        raise OpusError
+    try:
+        manifest = json.loads(f.read(length).decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise OpusError
+    if not is_safe_manifest(manifest):
+        raise OpusError
+    return manifest, HEADER.size + length
+
+
+def read_manifest(path) -> dict:
+    """Read only the manifest of an Opus file."""
+    with open(path, 'rb') as f:
+        return read_header(f)[0]
+
+
+def read_thumbnail(path):
+    """Read the thumbnail surface of an Opus file, or None if it was saved without one."""
+    with open(path, 'rb') as f:
+        manifest, start = read_header(f)
+        if manifest['thumbnail'] is None:
+            return None
+        f.seek(start + manifest['thumbnail'][0])
+        return pygame.image.load(io.BytesIO(f.read(manifest['thumbnail'][1])), 'thumbnail.png')
+
+
+def read_curves(path) -> list:
+    """
+    Read the precomputed curves of an Opus file, keeping only those whose equation is safe to parse and whose
+    expression hash still matches the equality parsed from it. Returns (equality, kind, request, solutions, tiles) for each relation,
+    where solutions is None if the solved branches were not stored.
+    """
+    with open(path, 'rb') as f:
+        manifest, start = read_header(f)
+        if manifest.get('curves') is None:
+            return []
+        f.seek(start + manifest['curves'][0])
+        section = f.read(manifest['curves'][1])
+
+    records = []
+    try:
+        with np.load(io.BytesIO(section), allow_pickle=False) as arrays:
+            for i, relation in enumerate(json.loads(arrays['meta'].tobytes().decode('utf-8'))):
+                if not is_safe_equation(relation['equation']):
+                    continue
+                try:
+                    equation = Relation(relation['equation'], None).get_expression()
+                except RelationError:
+                    continue
+                if relation['hash'] != expression_hash(equation):
+                    continue
+                solutions = decode_solutions(relation['solutions'])
+                tiles = {to_tuple(tile): Curve(arrays[f'{i}_{j}_points'], arrays[f'{i}_{j}_offsets'])
+                         for j, tile in enumerate(relation['tiles'])}
+                records.append((equation, relation['kind'], to_tuple(relation['request']), solutions, tiles))
+    except (OSError, ValueError, KeyError, UnicodeDecodeError):
+        raise OpusError
+    return records
+
+
+def to_fake_graph(manifest) -> FakeGraph:
+    """Create the fake graph described by a manifest."""
+    return FakeGraph(manifest['name'], manifest['equations'], manifest.get('colours'),
+                     manifest.get('domain'), manifest.get('range'))
+
+
+class OpusIndex:
+    """
+    The Opus index structure remembers the manifest of every Opus file in a directory, in a single index file.
+    Files are only opened again if their size or modification time has changed, and saves and deletions
+    update the index one entry at a time.
+    """
+    directory: str
+    entries: dict
+
+    # Load the index of a directory, or start an empty index if it is missing or unreadable. Entries with equations
+    # that are not safe to parse are dropped, so their files are read and checked again.
+    def __init__(self, directory) -> None:
+        self.directory = directory
+        self.entries = {}
+        try:
+            with open(os.path.join(directory, INDEX_NAME), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                self.entries = {file: entry for file, entry in index['entries'].items()
+                                if entry['manifest'] is None or is_safe_manifest(entry['manifest'])}
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            pass
+
+    # Return the size and modification time used to tell if a file has changed
+    def stamp(self, file) -> list:
+        stat = os.stat(os.path.join(self.directory, file))
+        return [stat.st_size, stat.st_mtime_ns]
+
+    # Write the index beside the directory's files, replacing the previous index in one step
+    def write(self) -> None:
+        path = os.path.join(self.directory, INDEX_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f)
+        os.replace(path + '.tmp', path)
+
+    # Bring the index up to date with the directory, reading the manifests of new and changed files only
+    def refresh(self) -> dict:
+        files = [file for file in os.listdir(self.directory) if file.lower().endswith('.opus')]
+        changed = False
+        for file in list(self.entries):
+            if file not in files:
+                self.entries.pop(file)
+                changed = True
+        for file in files:
+            stamp = self.stamp(file)
+            if file in self.entries and self.entries[file]['stamp'] == stamp:
+                continue
+            legacy = False
+            try:
+                manifest = read_manifest(os.path.join(self.directory, file))
+            except LegacyOpusError:
+                manifest, legacy = None, True
+            except (OSError, OpusError):
+                manifest = None
+            self.entries[file] = {'stamp': stamp, 'manifest': manifest, 'legacy': legacy}
+            changed = True
+        if changed:
+            self.write()
+        return self.saves()
+
+    # Return a fake graph for every valid Opus file, keyed by its path
+    def saves(self) -> dict:
+        return {os.path.join(self.directory, file): to_fake_graph(entry['manifest'])
+                for file, entry in self.entries.items() if entry['manifest'] is not None}
+
+    # Return the names of files saved in the old pickled format, which are left out of the saves
+    def legacy(self) -> list:
+        return sorted(file for file, entry in self.entries.items() if entry.get('legacy'))
+
+    # Save a fake graph to the directory and add it to the index
+    def save(self, file, graph, thumbnail=None) -> str:
+        path = os.path.join(self.directory, file)
+        manifest = write_opus(path, graph, thumbnail)
+        self.entries[file] = {'stamp': self.stamp(file), 'manifest': manifest}
+        self.write()
+        return path
+
+    # Delete an Opus file from the directory and the index
+    def remove(self, file) -> None:
+        os.remove(os.path.join(self.directory, file))
+        self.entries.pop(file, None)
+        self.write()
@@ -0,0 +1,85 @@
+import time
+from collections import deque
+import numpy as np
+from calc import tracing
+
+# If profiling is switched on. Hooks only read the clock while it is, so they cost a single check otherwise
+enabled = False
+
+# The number of frames that summaries are taken over
+HISTORY = 240
+
+# Time spent in each stage during the current frame, and how many times each stage ran
+frame = {}
+calls = {}
+
+# The duration and stage times of each recent frame, and the last solve time and sample count of each relation
+history = deque(maxlen=HISTORY)
+relations = {}
+
+
+def set_enabled(value) -> None:
+    """Switch profiling on or off, forgetting anything recorded before."""
+    global enabled
+    enabled = value
+    frame.clear()
+    calls.clear()
+    history.clear()
+    relations.clear()
+
+
+def clock():
+    """Return the time a stage started, or None if neither profiling nor tracing is on."""
+    return time.perf_counter() if enabled or tracing.enabled else None
+
+
+def add(stage, start) -> None:
+    """
+    Add the time since start to a stage of the current frame, and record it as a span if tracing.
+    Does nothing if the stage was not timed.
+    """
+    if start is None:
+        return
+    end = time.perf_counter()
+    tracing.span(stage, start, 'frame', end=end)
+    if enabled:
+        frame[stage] = frame.get(stage, 0) + end - start
+        calls[stage] = calls.get(stage, 0) + 1
+
+
+def add_relation(name, solve, samples) -> None:
+    """Remember how long a relation took to solve in its worker, and how many points its latest tiles sampled."""
+    if enabled:
+        relations[name] = (solve, samples)
+
+
+def end_frame(start) -> None:
+    """Record the frame that began at start, and begin the next."""
+    global frame, calls
+    if start is None:
+        return
+    end = time.perf_counter()
+    tracing.span('frame', start, 'frame', end=end)
+    tracing.next_frame()
+    if enabled:
+        history.append((end - start, frame, calls))
+        frame, calls = {}, {}
+
+
+def summary() -> dict:
+    """
+    Summarise the recent frames: percentiles of the frame time, the mean time of each stage per frame and
+    how often each stage ran, and each relation's solve time and sample count. Times are in seconds.
+    """
+    if len(history) == 0:
+        return {'frames': 0, 'percentiles': {}, 'stages': {}, 'relations': dict(relations)}
+    times = np.array([duration for duration, _, _ in history])
+    stages = {}
+    for _, stage_times, stage_calls in history:
+        for stage in stage_times:
+            total, count = stages.get(stage, (0, 0))
+            stages[stage] = (total + stage_times[stage], count + stage_calls[stage])
+    return {'frames': len(history),
+            'percentiles': {percentile: float(np.percentile(times, percentile)) for percentile in (50, 95, 99)},
+            'stages': {stage: (total / len(history), count / len(history)) for stage, (total, count) in stages.items()},
+            'relations': dict(relations)}
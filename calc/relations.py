@@ -1,7 +1,23 @@
+import re
+import sympy
+from tokenize import TokenError
 from symengine import Symbol, sympify, Eq, SympifyError
 from sympy import solveset, EmptySet, E
 from sympy import sympify as sympyify
 from sympy import SympifyError as SympyifyError
+from sympy.core.function import FunctionClass
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations, convert_xor
+from calc.cache import SOLUTIONS, BRANCHES
+from calc import tracing
+
+# Characters an equation may contain: letters, digits, operators, brackets and spaces
+SAFE_EQUATION = re.compile(r'[A-Za-z0-9+\-*/^().,=! ]*')
+
+# A point followed by a name is attribute access, not a decimal number
+ATTRIBUTE = re.compile(r'\.\s*[A-Za-z]')
+
+# The names an equation is parsed with, in place of sympy's namespace and python's builtins, created when first needed
+namespace = {}
 
 
 class RelationError(Exception):
@@ -9,6 +25,38 @@ class RelationError(Exception):
     pass
 
 
+def is_safe_equation(equation) -> bool:
+    """
+    Return if a string only contains the characters of an equation, without attribute access. Equations are parsed
+    by evaluating them, so anything else is rejected before it is parsed.
+    """
+    return (isinstance(equation, str) and SAFE_EQUATION.fullmatch(equation) is not None
+            and ATTRIBUTE.search(equation) is None)
+
+
+def get_namespace() -> dict:
+    """Return the names an equation may use: sympy's functions and constants, and nothing from python's builtins."""
+    if len(namespace) == 0:
+        for name in sympy.__all__:
+            attribute = getattr(sympy, name)
+            if isinstance(attribute, (FunctionClass, sympy.Basic)):
+                namespace[name] = attribute
+        namespace.update({"sqrt": sympy.sqrt, "root": sympy.root, "cbrt": sympy.cbrt, "abs": sympy.Abs,
+                          "Integer": sympy.Integer, "Float": sympy.Float, "Rational": sympy.Rational,
+                          "Symbol": sympy.Symbol, "__builtins__": {}})
+    return namespace
+
+
+def parse(expression, local_dict) -> object:
+    """Parse one side of an equation with the restricted namespace, as sympify would. Raises RelationError if invalid."""
+    try:
+        return parse_expr(expression, local_dict=dict(local_dict), global_dict=get_namespace(),
+                          transformations=standard_transformations + (convert_xor,))
+    except (NotImplementedError, ValueError, SympyifyError, TypeError, SyntaxError, TokenError, NameError,
+            AttributeError):
+        raise RelationError
+
+
 class Relation:
     """
     The relation structure allows for the digital symbolic representation of a mathematical expression.
@@ -19,32 +67,78 @@ class Relation:
     colour: tuple
     x_values: object
     y_values: object
+    branches: tuple
     rhs: str
     lhs: str
     original_str: str
 
-    # When initialised, do the bulk of the mathematics
+    # When initialised, parse the equation. Solving is deferred until the solutions are first needed.
     def __init__(self, equation, colour) -> None:
 
         # Create an equality from the string expression provided
+        start = tracing.clock()
         self.equality(equation)
+        tracing.span('parse', start, args={'equation': equation})
         self.colour = colour
         self.original_str = equation
+        self.x_values, self.y_values = None, None
+        self.branches = None
+
+        # Reuse the solutions of an equivalent equality if it has been solved before
+        cached = SOLUTIONS.get(self.equation)
+        if cached is not SOLUTIONS.MISSING:
+            self.x_values, self.y_values = cached
+
+    # Do the bulk of the mathematics. This is usually called from a worker process so pygame does not freeze.
+    def solve(self) -> None:
         x = Symbol('x')
         y = Symbol('y')
 
         # Attempt to solve for Y. If unsuccessful, or no solutions, try for X.
+        start = tracing.clock()
         try:
             self.y_values = sympify(solveset(self.get_expression(), y))
             self.x_values = EmptySet
         except (NotImplementedError, ValueError, SympifyError, TypeError):
             self.y_values = EmptySet
+        tracing.span('solveset', start, args={'equation': self.original_str, 'symbol': 'y'})
 
         if len(self.y_values.args) == 0:
+            start = tracing.clock()
             try:
                 self.x_values = sympify(solveset(self.get_expression(), x))
             except (NotImplementedError, ValueError, SympifyError, TypeError):
                 self.x_values = EmptySet
+            tracing.span('solveset', start, args={'equation': self.original_str, 'symbol': 'x'})
+
+        self.branches = None
+        SOLUTIONS.put(self.equation, (self.x_values, self.y_values))
+
+    # Return if the relation has been solved yet
+    def is_solved(self) -> bool:
+        return self.y_values is not None
+
+    # Adopt solutions found elsewhere, such as by a copy of this relation in a worker process
+    def set_solutions(self, x_values, y_values) -> None:
+        self.x_values, self.y_values = x_values, y_values
+        self.branches = None
+        SOLUTIONS.put(self.equation, (x_values, y_values))
+
+    # Convert the symbolic attributes to sympy when pickled, as symengine cannot pickle every function
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["branches"] = None
+        for attribute in ("equation", "x_values", "y_values"):
+            if state[attribute] is not None:
+                state[attribute] = sympyify(state[attribute])
+        return state
+
+    # Convert the symbolic attributes back to symengine when unpickled
+    def __setstate__(self, state) -> None:
+        for attribute in ("equation", "x_values", "y_values"):
+            if state[attribute] is not None:
+                state[attribute] = sympify(state[attribute])
+        self.__dict__.update(state)
 
     # Get the unaltered original string expression passed during initialisation
     def get_original(self) -> str:
@@ -52,6 +146,8 @@ class Relation:
 
     # Create a valid equality that can later be solved
     def equality(self, expression: str):
+        if not is_safe_equation(expression):
+            raise RelationError
         expression = expression.split("=")
         if len(expression) not in [1, 2]:
             raise RelationError
@@ -63,8 +159,8 @@ class Relation:
             self.rhs = expression[1]
         sympy_locals = {"e": E, "Y": Symbol('y'), "X": Symbol('x')}
         try:
-            self.equation = Eq(sympyify(self.lhs, locals=sympy_locals), sympyify(self.rhs, locals=sympy_locals))
-        except (NotImplementedError, ValueError, SympyifyError, TypeError):
+            self.equation = Eq(parse(self.lhs, sympy_locals), parse(self.rhs, sympy_locals))
+        except (NotImplementedError, ValueError, SympifyError, SympyifyError, TypeError):
             raise RelationError
 
     # Return the digital symbolic expression 
@@ -77,4 +173,22 @@ class Relation:
 
     # Return the functions of x and y. f(x), f(y)
     def f(self) -> tuple:
+        if not self.is_solved():
+            self.solve()
         return self.x_values, self.y_values
+
+    # Return the branches of the solutions for X and Y, with their odd roots rewritten to be real.
+    # They are rewritten once per equality, and reused by every tile and domain afterwards.
+    def get_branches(self) -> tuple:
+        if self.branches is None:
+            self.branches = BRANCHES.get(self.equation)
+        if self.branches is BRANCHES.MISSING:
+            from calc.evaluation import real_roots
+            x_values, y_values = self.f()
+            start = tracing.clock()
+            memo = {}
+            self.branches = (tuple(real_roots(expr, memo) for expr in x_values.args),
+                             tuple(real_roots(expr, memo) for expr in y_values.args))
+            tracing.span('real_roots', start, args={'equation': self.original_str})
+            BRANCHES.put(self.equation, self.branches)
+        return self.branches
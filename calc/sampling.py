@@ -0,0 +1,84 @@
+import math
+import numpy as np
+
+# Pixels between samples of the initial uniform pass
+COARSE_PIXELS = 2
+
+# Intervals narrower than a pixel divided by this are never split further
+SUBPIXEL = 4
+
+# Largest allowed deviation, in pixels, between a curve and the straight line drawn between two samples
+TOLERANCE_PIXELS = 0.5
+
+# The most samples a single curve may have, per pixel of the graph along the sampled axis
+SAMPLES_PER_PIXEL = 4
+
+
+def adaptive_sample(func, bounds, value_bounds, pixels):
+    """
+    Sample a vectorised function over bounds, refining only where the curve deviates from a straight line
+    by more than the pixel tolerance, crosses the edge of value_bounds or stops being defined.
+    Pixels is the size of the graph in pixels along the sampled axis and the value axis.
+    Returns the sorted sample positions and values. At most SAMPLES_PER_PIXEL * pixels[0] points are returned.
+    """
+    start, end = bounds
+    step = (end - start) / pixels[0]
+    tolerance = TOLERANCE_PIXELS * (value_bounds[1] - value_bounds[0]) / pixels[1]
+    max_points = SAMPLES_PER_PIXEL * pixels[0]
+
+    # Values far outside the graph are clipped so that they do not trigger pointless refinement
+    margin = (value_bounds[1] - value_bounds[0]) / 2
+    low, high = value_bounds[0] - margin, value_bounds[1] + margin
+
+    # Begin with a uniform pass
+    count = min(max_points // 2, math.ceil(pixels[0] / COARSE_PIXELS)) + 1
+    positions = np.linspace(start, end, count)
+    values = func(positions)
+    active = np.ones(count - 1, dtype=bool)
+
+    while np.any(active) and len(positions) < max_points:
+
+        # Only consider intervals still marked for refinement that are wider than the smallest allowed
+        widths = np.diff(positions)
+        active &= widths > step / SUBPIXEL
+        candidates = np.flatnonzero(active)
+        if len(candidates) == 0:
+            break
+
+        mids = (positions[candidates] + positions[candidates + 1]) / 2
+        mid_values = func(mids)
+        left, right = values[candidates], values[candidates + 1]
+
+        # Measure how far the midpoint is from the straight line between its neighbours
+        with np.errstate(invalid='ignore'):
+            error = np.abs(np.clip(mid_values, low, high) - (np.clip(left, low, high) + np.clip(right, low, high)) / 2)
+        error = np.nan_to_num(error, nan=0.0) / tolerance
+
+        # Always refine where the curve becomes undefined or leaves the graph's range
+        finite = np.isfinite(np.stack([left, mid_values, right]))
+        with np.errstate(invalid='ignore'):
+            inside = finite & (np.stack([left, mid_values, right]) >= value_bounds[0]) & \
+                     (np.stack([left, mid_values, right]) <= value_bounds[1])
+        boundary = np.any(finite != finite[0], axis=0) | np.any(inside != inside[0], axis=0)
+        error[boundary] = np.inf
+
+        split = error > 1
+        if not np.any(split):
+            break
+
+        # Respect the point budget by splitting only the worst intervals
+        budget = max_points - len(positions)
+        if np.count_nonzero(split) > budget:
+            worst = np.argsort(-error, kind='stable')[:budget]
+            split = np.zeros_like(split)
+            split[worst] = True
+
+        # Insert the accepted midpoints; both halves of a split interval stay active
+        new_active = active.copy()
+        new_active[candidates[~split]] = False
+        insert_at = candidates[split] + 1
+        positions = np.insert(positions, insert_at, mids[split])
+        values = np.insert(values, insert_at, mid_values[split])
+        active = np.insert(new_active, insert_at, True)
+
+    return positions, values
@@ -0,0 +1,79 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from calc import tracing
+from calc.tiles import plot_kind, needed_tiles, calculate_tile
+
+# The process pool shared by every graph, created the first time it is needed
+executor = None
+
+# Number of worker processes in the pool. None leaves one core free, and 0 calculates jobs as they are submitted.
+max_workers = None
+
+
+def set_max_workers(workers) -> None:
+    """Set how many worker processes calculate jobs. Must be called before the first job is submitted."""
+    global max_workers
+    max_workers = workers
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the shared process pool, leaving one core free for the pygame event loop."""
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=max_workers or max(1, (os.cpu_count() or 2) - 1))
+    return executor
+
+
+def calculate_job(relation, func_domain, func_range, viewport, scales, kind, tiles, known=frozenset(),
+                  trace=None) -> tuple:
+    """
+    Solve a relation and calculate some of its tiles inside a worker process.
+    If the kind of plot is not known yet it is decided first, and if no tiles are given, every visible tile is
+    calculated except those in known, which the caller has already calculated. The relation is returned alongside
+    its tiles so the caller can adopt its solutions, with the seconds spent solving it and sampling its tiles.
+    If the job was submitted with a trace context, the spans recorded while calculating it are returned too.
+    """
+    state = tracing.begin_job(trace) if trace is not None else None
+    solve = time.perf_counter()
+    if not relation.is_solved():
+        relation.solve()
+    sample = time.perf_counter()
+    if kind is None:
+        kind = plot_kind(relation, func_domain, func_range)
+    if tiles is None:
+        tiles = [tile for tile in needed_tiles(kind, func_domain, func_range, viewport, scales) if tile not in known]
+    calculated = {tile: calculate_tile(relation, tile) for tile in tiles}
+    timings = {'solve': sample - solve, 'sample': time.perf_counter() - sample}
+    if state is not None:
+        tracing.span('solve', solve, end=sample)
+        tracing.span('sample', sample, end=sample + timings['sample'])
+        timings['spans'] = tracing.end_job(state)
+    return calculated, kind, relation, timings
+
+
+def submit(job) -> Future:
+    """
+    Queue a tuple of calculate_job arguments on the process pool and return immediately.
+    The Future resolves to the calculated tiles, the kind of plot, the solved relation and the time taken.
+    Jobs that have not started yet can be cancelled. Without workers, the job is calculated before returning, and any
+    error it raises is held by the Future as a worker's would be.
+    While tracing, the job carries the frame that submitted it so that its spans can be traced back to it.
+    """
+    trace = tracing.context()
+    if max_workers == 0:
+        future = Future()
+        try:
+            future.set_result(calculate_job(*job, trace=trace))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+    return get_executor().submit(calculate_job, *job, trace=trace)
+
+
+def shutdown() -> None:
+    """Cancel any queued jobs and stop the process pool without waiting for it."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -0,0 +1,78 @@
+import math
+import pygame
+from commons import get_font, REGULAR
+
+# Spacing between ticks, as a (numerator, denominator) fraction of a unit, for each upper bound of the scale.
+# Bounds are exclusive below 15 and inclusive from 75, matching the original per-value checks.
+TICK_STEPS = [(2, False, (100, 1)), (5, False, (20, 1)), (15, False, (5, 1)),
+              (75, True, (1, 1)), (175, True, (1, 2)), (400, True, (1, 10))]
+
+# Characters that make up every tick label
+LABEL_CHARACTERS = '-.0123456789'
+
+# Label atlases keyed by font size and colour, created the first time they are needed
+atlases = {}
+
+
+def tick_step(scale, finest) -> tuple:
+    """
+    Return the spacing between ticks at a scale (pixels per unit) as a (numerator, denominator) fraction.
+    Finest is the smallest spacing allowed by the domain or range, as another fraction.
+    """
+    step = finest
+    for bound, inclusive, candidate in TICK_STEPS:
+        if scale < bound or (inclusive and scale == bound):
+            step = candidate
+            break
+    return step if step[0] / step[1] >= finest[0] / finest[1] else finest
+
+
+def ticks(view, scale, finest) -> list:
+    """
+    Return the value and label of every tick within a visible interval of an axis, other than zero.
+    Only the visible ticks are generated, however large the interval.
+    """
+    numerator, denominator = tick_step(scale, finest)
+    first = math.floor(view[0] * denominator / numerator)
+    last = math.ceil(view[1] * denominator / numerator)
+    return [((index * numerator) / denominator, str((index * numerator) / denominator))
+            for index in range(first, last + 1) if index != 0]
+
+
+class LabelAtlas:
+    """
+    The label atlas structure renders every character used by tick labels once, onto a single surface.
+    Labels are drawn by blitting areas of the atlas, so no text is rendered while drawing the axes.
+    """
+    surface: pygame.Surface
+    areas: dict
+
+    # Render each label character side by side in one font size and colour
+    def __init__(self, px, colour, font=REGULAR) -> None:
+        glyphs = [get_font(font, px).render(character, True, colour) for character in LABEL_CHARACTERS]
+        self.surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs),
+                                       max(glyph.get_height() for glyph in glyphs)), pygame.SRCALPHA)
+        self.areas = {}
+        x_accumulated = 0
+        for character, glyph in zip(LABEL_CHARACTERS, glyphs):
+            self.surface.blit(glyph, (x_accumulated, 0))
+            self.areas[character] = pygame.Rect(x_accumulated, 0, glyph.get_width(), glyph.get_height())
+            x_accumulated += glyph.get_width()
+
+    # Return the width in pixels of a label
+    def width(self, label) -> int:
+        return sum(self.areas[character].width for character in label)
+
+    # Draw a label onto a surface, with its top left corner at the given position
+    def blit(self, surface, label, pos) -> None:
+        x_accumulated = pos[0]
+        for character in label:
+            surface.blit(self.surface, (x_accumulated, pos[1]), self.areas[character])
+            x_accumulated += self.areas[character].width
+
+
+def get_label_atlas(px, colour) -> LabelAtlas:
+    """Return the shared label atlas for a font size and colour."""
+    if (px, colour) not in atlases:
+        atlases[(px, colour)] = LabelAtlas(px, colour)
+    return atlases[(px, colour)]
@@ -0,0 +1,151 @@
+import math
+from collections import OrderedDict
+from calc.curves import from_lines
+from calc import tracing
+
+# The ways a relation can be plotted: as y = f(x), as x = f(y), by tracing g(x, y) = 0, or not at all (None)
+Y_FUNCTION, X_FUNCTION, IMPLICIT = 0, 1, 2
+
+# Width of a tile in pixels at its zoom level
+TILE_PIXELS = 256
+
+# Tiles calculated beyond each edge of the viewport, so that panning rarely waits for new tiles
+VIEW_MARGIN = 1
+
+# Pixel size of the coarse pass used to decide how a relation is plotted
+PROBE_PIXELS = (256, 256)
+
+# The most tiles remembered for each relation
+MAX_TILES = 512
+
+
+def zoom_level(scale) -> int:
+    """Round a scale (pixels per unit) up to a power of two, so small zooms reuse the same tiles."""
+    return math.ceil(math.log2(max(scale, 1)))
+
+
+def plot_kind(relation, func_domain, func_range):
+    """
+    Decide how a relation is plotted over a domain and range.
+    Functions of x are preferred, then functions of y. If neither draws anything, the relation is traced implicitly.
+    Returns None if nothing is drawn, as for an equation that is always true or always false.
+    """
+    if not relation.get_expression().is_Equality:
+        return None
+
+    # The solver is imported where tiles are calculated, so that drawing a graph never waits for sympy to load
+    from symengine import Symbol
+    from calc.evaluation import calculate
+
+    x_exprs, y_exprs = relation.get_branches()
+    if len(y_exprs) > 0:
+        lines_to_draw, out_of_range = calculate(Symbol('x'), y_exprs, func_domain, func_range, PROBE_PIXELS, True)
+        kind = Y_FUNCTION
+    else:
+        lines_to_draw, out_of_range = calculate(Symbol('y'), x_exprs, func_range, func_domain, PROBE_PIXELS, False)
+        kind = X_FUNCTION
+    if len(lines_to_draw) > 0 or out_of_range:
+        return kind
+    return IMPLICIT if relation.lhs != relation.rhs else None
+
+
+def kind_holds(kind, request, new_request) -> bool:
+    """
+    Return if a relation plotted as kind over one (domain, range) request is still plotted that way over another.
+    A function of x is kept while its range is unchanged and a function of y while its domain is, as tiles of each
+    are keyed by those bounds. Anything else is decided again, since a new range may show it as a function.
+    """
+    if kind == Y_FUNCTION:
+        return request[1] == new_request[1]
+    if kind == X_FUNCTION:
+        return request[0] == new_request[0]
+    return False
+
+
+def tile_intervals(bounds, view, level) -> list:
+    """Return the tile index and clipped interval of every tile along one axis that is visible and within bounds."""
+    width = TILE_PIXELS / 2 ** level
+    first = max(math.floor(view[0] / width) - VIEW_MARGIN, math.floor(bounds[0] / width))
+    last = min(math.floor(view[1] / width) + VIEW_MARGIN, math.ceil(bounds[1] / width) - 1)
+    intervals = []
+    for index in range(first, last + 1):
+        interval = (max(index * width, bounds[0]), min((index + 1) * width, bounds[1]))
+        if interval[1] > interval[0]:
+            intervals.append(interval)
+    return intervals
+
+
+def needed_tiles(kind, func_domain, func_range, viewport, scales) -> list:
+    """
+    Return the keys of every tile needed to draw a relation of the given kind over the visible part of the graph.
+    Viewport is the visible ((x_min, x_max), (y_min, y_max)) and scales the pixels per unit along each axis.
+    A key holds everything needed to calculate its tile, so a tile stays valid while only the viewport moves
+    or the domain grows around it.
+    """
+    level_x, level_y = zoom_level(scales[0]), zoom_level(scales[1])
+    x_pixels = 2 ** level_x
+    y_pixels = 2 ** level_y
+
+    if kind == Y_FUNCTION:
+        value_pixels = max(1, round((func_range[1] - func_range[0]) * y_pixels))
+        return [(kind, interval, func_range, (max(1, round((interval[1] - interval[0]) * x_pixels)), value_pixels))
+                for interval in tile_intervals(func_domain, viewport[0], level_x)]
+    if kind == X_FUNCTION:
+        value_pixels = max(1, round((func_domain[1] - func_domain[0]) * x_pixels))
+        return [(kind, interval, func_domain, (max(1, round((interval[1] - interval[0]) * y_pixels)), value_pixels))
+                for interval in tile_intervals(func_range, viewport[1], level_y)]
+    if kind == IMPLICIT:
+        return [(kind, x_interval, y_interval, (max(1, round((x_interval[1] - x_interval[0]) * x_pixels)),
+                                                max(1, round((y_interval[1] - y_interval[0]) * y_pixels))))
+                for x_interval in tile_intervals(func_domain, viewport[0], level_x)
+                for y_interval in tile_intervals(func_range, viewport[1], level_y)]
+    return []
+
+
+def calculate_tile(relation, tile):
+    """Calculate the curve of a relation within a single tile."""
+    from symengine import Symbol
+    from calc.evaluation import calculate
+    from calc.implicit import contour
+
+    kind, bounds, value_bounds, pixels = tile
+    start = tracing.clock()
+    if kind == Y_FUNCTION:
+        curve = from_lines(calculate(Symbol('x'), relation.get_branches()[1], bounds, value_bounds, pixels, True)[0])
+    elif kind == X_FUNCTION:
+        curve = from_lines(calculate(Symbol('y'), relation.get_branches()[0], bounds, value_bounds, pixels, False)[0])
+    else:
+        curve = from_lines(contour(relation, bounds, value_bounds, pixels))
+    tracing.span('tile', start, args={'kind': kind, 'bounds': [list(bounds), list(value_bounds)]})
+    return curve
+
+
+class TileCache:
+    """
+    The tile cache structure remembers the calculated curve of one relation, tile by tile.
+    The least recently used tiles are forgotten once MAX_TILES are held.
+    """
+
+    # Initialise an empty cache
+    def __init__(self) -> None:
+        self.tiles = OrderedDict()
+
+    # Return if a tile has been calculated
+    def __contains__(self, tile) -> bool:
+        return tile in self.tiles
+
+    # Store the curve of a tile, forgetting the least recently used tiles if the cache is full
+    def put(self, tile, curve) -> None:
+        self.tiles[tile] = curve
+        self.tiles.move_to_end(tile)
+        while len(self.tiles) > MAX_TILES:
+            self.tiles.popitem(last=False)
+
+    # Return the keys of every calculated tile
+    def keys(self) -> frozenset:
+        return frozenset(self.tiles)
+
+    # Return the curve of a tile and mark it as recently used
+    def get(self, tile):
+        self.tiles.move_to_end(tile)
+        return self.tiles[tile]
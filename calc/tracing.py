@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import threading
+from itertools import count
+
+# The environment variable that switches tracing on, naming the file the trace is written to
+TRACE_VARIABLE = 'INSIDIA_TRACE'
+
+# If tracing is switched on, and the file the trace is written to. Hooks cost a single check while it is off.
+enabled = False
+path = None
+
+# Every span recorded so far, as Chrome trace events
+events = []
+
+# The main-loop frame spans are currently recorded for. Inside a job, this is the frame that submitted it.
+frame = 0
+
+# Identifies each job submitted, linking it to the worker that calculated it
+jobs = count(1)
+
+
+def set_enabled(trace_path) -> None:
+    """Start tracing, to be written to trace_path when finished. Tracing is switched off if trace_path is None."""
+    global enabled, path
+    enabled = trace_path is not None
+    path = trace_path
+    events.clear()
+
+
+def enable_from_environment() -> None:
+    """Start tracing if the environment variable names a file to write the trace to."""
+    if os.environ.get(TRACE_VARIABLE):
+        set_enabled(os.environ[TRACE_VARIABLE])
+
+
+def clock():
+    """Return the time a span started, or None if tracing is off."""
+    return time.perf_counter() if enabled else None
+
+
+def microseconds(seconds) -> float:
+    """Convert a time from the clock to the microseconds used by trace events."""
+    return round(seconds * 1000000, 3)
+
+
+def span(name, start, category='calc', args=None, end=None) -> None:
+    """
+    Record a span from start until end, or until now, on the current process and thread.
+    Each span is labelled with the frame it was recorded for, unless args name another. Does nothing if the span
+    was not timed.
+    """
+    if start is None or not enabled:
+        return
+    end = time.perf_counter() if end is None else end
+    events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': microseconds(start),
+                   'dur': microseconds(end - start), 'pid': os.getpid(), 'tid': threading.get_ident(),
+                   'args': dict({'frame': frame}, **(args or {}))})
+
+
+def next_frame() -> None:
+    """Begin recording spans for the next main-loop frame."""
+    global frame
+    frame += 1
+
+
+def context():
+    """
+    Return what a job needs to be traced in a worker: the frame submitting it, an identifier and the time it was
+    submitted, and the process that submitted it. Returns None if tracing is off, in which case jobs are not traced.
+    """
+    if not enabled:
+        return None
+    job, submitted = next(jobs), time.perf_counter()
+    events.append({'name': 'job', 'cat': 'job', 'ph': 's', 'id': job, 'ts': microseconds(submitted),
+                   'pid': os.getpid(), 'tid': threading.get_ident()})
+    return frame, job, submitted, os.getpid()
+
+
+def begin_job(trace):
+    """
+    Start recording the spans of a job submitted with the given context, separately from anything recorded before.
+    The time the job spent queued is recorded on the process that submitted it, and the job is linked to the span of
+    the submitting frame. Returns the state to restore with end_job.
+    """
+    global enabled, events, frame
+    saved = enabled, events, frame
+    enabled, events, frame = True, [], trace[0]
+    started = time.perf_counter()
+    queue = {'name': 'queue', 'cat': 'queue', 'id': trace[1], 'pid': trace[3], 'tid': 0, 'args': {'frame': frame}}
+    events.append(dict(queue, ph='b', ts=microseconds(trace[2])))
+    events.append(dict(queue, ph='e', ts=microseconds(started)))
+    events.append({'name': 'job', 'cat': 'job', 'ph': 'f', 'bp': 'e', 'id': trace[1], 'ts': microseconds(started),
+                   'pid': os.getpid(), 'tid': threading.get_ident()})
+    return saved, started
+
+
+def end_job(state) -> list:
+    """Finish recording a job begun with begin_job, returning its spans and restoring the state from before it."""
+    global enabled, events, frame
+    (saved_enabled, saved_events, saved_frame), started = state
+    span('job', started)
+    spans = events
+    enabled, events, frame = saved_enabled, saved_events, saved_frame
+    return spans
+
+
+def extend(spans) -> None:
+    """Add the spans recorded by a job to the trace."""
+    if enabled and spans:
+        events.extend(spans)
+
+
+def write() -> None:
+    """
+    Write the trace as a Chrome trace JSON file, which can be opened in Perfetto or chrome://tracing.
+    Spans are timed with a clock shared by every process, so the spans of workers line up with those of the main loop.
+    """
+    if not enabled:
+        return
+    processes = {event['pid'] for event in events}
+    names = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+              'args': {'name': 'Insidia' if pid == os.getpid() else f'Worker {pid}'}} for pid in sorted(processes)]
+    names.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': 0, 'args': {'name': 'Queued jobs'}})
+    names.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': threading.main_thread().ident,
+                  'args': {'name': 'Main loop'}})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': names + events, 'displayTimeUnit': 'ms'}, f)
@@ -1,6 +1,7 @@
 import os
 import sys
 import pygame
+from functools import lru_cache
 
 WHITE = (255, 255, 255)
 BACKGROUND_COLOUR = (14, 17, 23)
@@ -9,6 +10,10 @@ BACKGROUND_COLOUR = (14, 17, 23)
 TITLE, SUBHEADING, REGULAR, PRESS_START = 'Oxanium-Bold.ttf', 'Oxanium-Medium.ttf', \
         'Oxanium-Regular.ttf', 'press-start.ttf'
 
+# The most opened fonts and rendered text surfaces kept at once
+FONTS = 32
+TEXTS = 2048
+
 
 # Change current path for main.py if Insidia is running in an executable (.exe)
 def get_current_path_main():
@@ -33,12 +38,32 @@ def get_opus_path():
         return os.path.dirname(__file__)
 
 
+@lru_cache(maxsize=FONTS)
+def get_font(font, px):
+    """Returns the app font at a pixel size, opening the font file only the first time it is needed."""
+    return pygame.font.Font(os.path.join(get_current_path_main(), 'assets', 'fonts', font), px)
+
+
+@lru_cache(maxsize=TEXTS)
+def render_cached(text, px, font, color, alpha):
+    """Returns a rendered text surface, rendering it only the first time the same arguments are seen."""
+    surface = get_font(font, px).render(text, True, color)
+    surface.set_alpha(alpha) if alpha is not None else None
+    return surface
+
+
 def render_text(text, px, font=REGULAR, color=WHITE, alpha=None):
-    """Returns a pygame surface with the passed text in the app font."""
-    font = pygame.font.Font(os.path.join(get_current_path_main(), 'assets', 'fonts', font), px)
-    text = font.render(text, True, color)
-    text.set_alpha(alpha) if alpha is not None else None
-    return text
+    """
+    Returns a pygame surface with the passed text in the app font.
+    Surfaces are shared between calls with the same arguments, so they must not be drawn on.
+    """
+    return render_cached(text, px, font, tuple(color), alpha)
+
+
+def text_cache_stats():
+    """Returns the size and hit/miss counters of the font and text caches."""
+    return {name: {'size': info.currsize, 'max_size': info.maxsize, 'hits': info.hits, 'misses': info.misses}
+            for name, info in (('fonts', get_font.cache_info()), ('texts', render_cached.cache_info()))}
 
 
 def coloured_text(text, px, color=WHITE):
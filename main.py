@@ -1,17 +1,21 @@
 import os
 import sys
+import argparse
 
 import pygame
-import pickle
+from multiprocessing import freeze_support
+from concurrent.futures import ThreadPoolExecutor
 from random import choice
 from pygame.locals import *
 
 from commons import render_text, coloured_text, get_opus_path, get_current_path_main, TITLE, SUBHEADING, BACKGROUND_COLOUR
 from calc.graphing import Graph
-from calc.relations import Relation, RelationError
+from calc import scheduler, profiler, tracing
 
 from widgets.textbox import Textbox
 from widgets.button import Button
+from widgets.compositor import Compositor
+from widgets.overlay import Overlay
 from tkinter import messagebox
 
 # Versioning
@@ -71,6 +75,13 @@ HOME_BODY_MESSAGES = [coloured_text(f"||col.{AQUA}||Math no longer has to be cri
                       coloured_text(f"Discover more! Try your own equations. Head over to the ||col.{GREEN}||sidebar||col.{WHITE}|| to get started.", 17)
                       ]
 
+# The demo graph's view, and its curves precomputed by build_assets.py
+DEMO_SIZE, DEMO_DOMAIN, DEMO_RANGE = (600, 300), (-10, 10), (-2, 2)
+DEMO_ASSET = os.path.join(CurrentPath, 'assets', 'demo', 'square_wave')
+
+# The key that shows or hides the profiling overlay
+PROFILER_KEY = pygame.K_F3
+
 # Frames per second constant
 FPS = 120
 
@@ -90,6 +101,36 @@ def square_wave(accuracy):
     return eq
 
 
+def load_solver(frame=0):
+    """
+    Import the symbolic maths modules, parse the demo relation and map its precomputed curves.
+    This runs on a background thread at startup, so the home page is shown while sympy loads. The frame
+    that started it labels its span when tracing.
+    Returns the relations of the demo graph and its curve records. If the curve asset is missing or out of date,
+    there are no records and the demo is solved as usual.
+    """
+    start = tracing.clock()
+    import calc.evaluation
+    import calc.opus
+    from calc.relations import Relation
+    from calc.assets import read_curve_asset
+    try:
+        records = read_curve_asset(DEMO_ASSET)
+    except (OSError, calc.opus.OpusError):
+        records = []
+    relations = [Relation(square_wave(31), DEMO_PURPLE)]
+    tracing.span('load_solver', start, 'startup', {'frame': frame})
+    return relations, records
+
+
+def open_opus_index(opus_index):
+    """Returns the index of the Opus directory, importing the Opus module the first time it is needed."""
+    if opus_index is None:
+        from calc.opus import OpusIndex
+        opus_index = OpusIndex(os.path.join(get_opus_path(), 'opus'))
+    return opus_index
+
+
 def get_sidebar(sidebar, status, saving_now):
     """
     Returns a tuple containing the sidebar information.
@@ -136,64 +177,100 @@ def get_sidebar(sidebar, status, saving_now):
         return open_text, open_button
 
 
-def draw_home(win, sidebar_offset, graph, home_rels):
+def get_sidebar_hover(sidebar):
+    """Return which of the sidebar's buttons are under the mouse, which changes how the sidebar is drawn."""
+    rects = [sidebar[SIDEBAR_BUTTON]] + (sidebar[SIDEBAR_PAGES] if len(sidebar) > SIDEBAR_PAGES else [])
+    return tuple(rect.collidepoint(pygame.mouse.get_pos()) for rect in rects)
+
+
+def draw_slider(win, compositor, slider, pos):
+    """Draw a slider if it has changed since the last frame. Returns the height it takes up."""
+    if compositor.changed(slider, (slider.get_state(), pos)):
+        win.blit(slider.create(), pos)
+        compositor.mark(slider, slider.current_surface.get_rect(topleft=pos))
+    slider.set_pos(pos)
+    return slider.current_surface.get_height()
+
+
+def draw_button(win, compositor, button, mode, left, top):
+    """Draw a button if it has changed since the last frame."""
+    if compositor.changed(button, (button.get_state(mode), (left, top))):
+        button.create(win, mode, left, top)
+        compositor.mark(button, button.last_surface.get_rect(topleft=(left, top)))
+
+
+def draw_textbox(win, compositor, textbox, left, top):
+    """Draw a textbox if it has changed since the last frame."""
+    if compositor.changed(textbox, (textbox.get_state(), (left, top))):
+        textbox.create(win, left, top)
+        compositor.mark(textbox, textbox.last_surface.get_rect(topleft=(left, top)))
+
+
+def draw_graph(win, compositor, graph, graph_surface, pos, placeholder=None):
+    """Draw a graph's surface if it has changed since the last frame, with a placeholder message over it if given."""
+    if compositor.changed(graph, (graph.version, pos, placeholder)):
+        win.blit(graph_surface, pos)
+        if placeholder is not None:
+            text = render_text(placeholder, 20, color=SIDEBAR_COLOUR)
+            rect = text.get_rect(center=(pos[0] + graph_surface.get_width() / 2, pos[1] + graph_surface.get_height() / 4))
+            pygame.draw.rect(win, WHITE, rect.inflate(20, 10), border_radius=5)
+            win.blit(text, rect)
+        compositor.mark(graph, graph_surface.get_rect(topleft=pos))
+
+
+def draw_home(win, compositor, sidebar_offset, graph, home_rels):
     """Draw the home page of Insidia."""
-    win.fill(BACKGROUND_COLOUR)
-    title = render_text("Insidia: Your partner in math", 40, font=TITLE)
-    win.blit(title, (sidebar_offset + 80, 80))
+    if compositor.full:
+        win.fill(BACKGROUND_COLOUR)
+        title = render_text("Insidia: Your partner in math", 40, font=TITLE)
+        win.blit(title, (sidebar_offset + 80, 80))
+        y_accumulated = 0
+        for message in HOME_BODY_MESSAGES:
+            win.blit(message, (sidebar_offset + 80, 490 + y_accumulated))
+            y_accumulated += message.get_height() + 25
 
     # Create and draw the demo graph and its sliders relative to sidebar position
-    win.blit(
-        graph.create((-10, 10), (-2, 2), home_rels, (sidebar_offset + 80, 190), scale_x=graph.get_sliders()[0].value(),
-                     scale_y=graph.get_sliders()[1].value()),
-        (sidebar_offset + 80, 155))
+    draw_graph(win, compositor, graph,
+               graph.create(DEMO_DOMAIN, DEMO_RANGE, home_rels, (sidebar_offset + 80, 190), scale_x=graph.get_sliders()[0].value(),
+                            scale_y=graph.get_sliders()[1].value()),
+               (sidebar_offset + 80, 155), placeholder="Preparing the demo..." if len(home_rels) == 0 else None)
     graph.set_pos((sidebar_offset + 80, 155))
     y_accumulated = 0
     for slider in graph.get_sliders():
-        surface = slider.create()
-        win.blit(surface, (sidebar_offset + 700, 155 + y_accumulated))
-        slider.set_pos((sidebar_offset + 700, 155 + y_accumulated))
-        y_accumulated += surface.get_height() + 20
+        y_accumulated += draw_slider(win, compositor, slider, (sidebar_offset + 700, 155 + y_accumulated)) + 20
     x_accumulated = 0
     for button in graph.get_buttons():
-        button.create(win, graph.get_mode(), sidebar_offset + 710 +
-                      x_accumulated, 155 + y_accumulated)
+        draw_button(win, compositor, button, graph.get_mode(), sidebar_offset + 710 +
+                    x_accumulated, 155 + y_accumulated)
         x_accumulated += button.size[0] + 15
-    y_accumulated = 0
-    for message in HOME_BODY_MESSAGES:
-        win.blit(message, (sidebar_offset + 80, 490 + y_accumulated))
-        y_accumulated += message.get_height() + 25
 
 
-def draw_graphing(win, sidebar_offset, graph, rels, func_domain, func_range):
+def draw_graphing(win, compositor, sidebar_offset, graph, rels, func_domain, func_range):
     """Draw the graphing calculator page of Insidia."""
-    win.fill(BACKGROUND_COLOUR)
+    if compositor.full:
+        win.fill(BACKGROUND_COLOUR)
 
     # Create and draw the main graph and its sliders, equation inputs and buttons relative to the sidebar position
     graph.set_pos((sidebar_offset + 70, 50))
     y_accumulated = 0
     for slider in graph.get_sliders():
-        surface = slider.create()
-        win.blit(surface, (sidebar_offset +
-                           graph.size[0] + 90, 50 + y_accumulated))
-        slider.set_pos(
-            (sidebar_offset + graph.size[0] + 90, 50 + y_accumulated))
-        y_accumulated += surface.get_height() + 20
+        y_accumulated += draw_slider(win, compositor, slider,
+                                     (sidebar_offset + graph.size[0] + 90, 50 + y_accumulated)) + 20
     x_accumulated = 0
     for i, button in enumerate(graph.get_buttons()):
         if i != 3:
-            button.create(win, graph.get_mode(), sidebar_offset + graph.size[0] + 100 +
-                          x_accumulated, 50 + y_accumulated)
+            draw_button(win, compositor, button, graph.get_mode(), sidebar_offset + graph.size[0] + 100 +
+                        x_accumulated, 50 + y_accumulated)
             if i < 2:
                 x_accumulated += button.size[0] + 15
             continue
-        button.create(win, graph.get_mode(), sidebar_offset + graph.size[0] + 100 +
-                      x_accumulated + 5, 50 + y_accumulated + 80)
+        draw_button(win, compositor, button, graph.get_mode(), sidebar_offset + graph.size[0] + 100 +
+                    x_accumulated + 5, 50 + y_accumulated + 80)
     y_accumulated += 70
     x_accumulated = 0
     for i, textbox in enumerate(graph.get_d_r_boxes()):
-        textbox.create(win, sidebar_offset +
-                       graph.size[0] + 100 + x_accumulated, 50 + y_accumulated)
+        draw_textbox(win, compositor, textbox, sidebar_offset +
+                     graph.size[0] + 100 + x_accumulated, 50 + y_accumulated)
         if i == 1:
             y_accumulated += 60
             x_accumulated -= textbox.size[0] + 15
@@ -201,16 +278,21 @@ def draw_graphing(win, sidebar_offset, graph, rels, func_domain, func_range):
         x_accumulated += textbox.size[0] + 15
     y_accumulated += 70
     for textbox in graph.get_textboxes():
-        textbox.create(win, sidebar_offset +
-                       graph.size[0] + 100, 50 + y_accumulated)
+        draw_textbox(win, compositor, textbox, sidebar_offset +
+                     graph.size[0] + 100, 50 + y_accumulated)
         y_accumulated += textbox.size[1] + 40
-    win.blit(graph.create(func_domain, func_range, list(rels.values()), (sidebar_offset + 70, 50),
-                          scale_x=graph.get_sliders()[0].value(), scale_y=graph.get_sliders()[1].value()),
-             (sidebar_offset + 70, 50))
-
-
-def draw_save(win, sidebar_offset, save_button, save_textbox, opus_saves, opus_removal_buttons, opus_load_buttons, saving_now, snapshot_button, scroll_list_offset, scroll_down, scroll_up):
-    """Draw the Opus page of Insidia."""
+    draw_graph(win, compositor, graph,
+               graph.create(func_domain, func_range, list(rels.values()), (sidebar_offset + 70, 50),
+                            scale_x=graph.get_sliders()[0].value(), scale_y=graph.get_sliders()[1].value()),
+               (sidebar_offset + 70, 50))
+
+
+def draw_save(win, compositor, sidebar_offset, save_button, save_textbox, opus_saves, opus_removal_buttons, opus_load_buttons, saving_now, snapshot_button, scroll_list_offset, scroll_down, scroll_up):
+    """Draw the Opus page of Insidia. The page is only drawn again, as a whole, once the mouse or its contents change."""
+    if not compositor.changed('opus', (pygame.mouse.get_pos(), saving_now, save_textbox.get_state(), scroll_list_offset,
+                                     tuple(opus_saves))):
+        return
+    compositor.invalidate()
     win.fill(BACKGROUND_COLOUR)
     title = render_text("Insidia: Opus", 40, font=TITLE)
     win.blit(title, (sidebar_offset + 80, 80))
@@ -249,14 +331,14 @@ def draw_save(win, sidebar_offset, save_button, save_textbox, opus_saves, opus_r
             coords = (0, y_accumulated)
             save_rect = pygame.Rect(coords[0], coords[1] - scroll_list_offset, 600, text.get_height() + 30)
             pygame.draw.rect(scroll_list, SIDEBAR_COLOUR, save_rect, border_radius=10)
-            if opus_removal_buttons[opus_saves[save]].last_surface is not None:
-                opus_removal_buttons[opus_saves[save]].on_hover()
-            opus_removal_buttons[opus_saves[save]].create(scroll_list, 0, coords[0] + 600 - 50, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
-            opus_removal_buttons[opus_saves[save]].pos = (coords[0] + 600 - 50 + sidebar_offset + 80, 80 + title.get_height() + 40 + subtitle.get_height() + saved_graphs_title.get_height() + save_button.size[1] + 50 + coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
-            if opus_load_buttons[opus_saves[save]].last_surface is not None:
-                opus_load_buttons[opus_saves[save]].on_hover()
-            opus_load_buttons[opus_saves[save]].create(scroll_list, 0, coords[0] + 600 - 100, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
-            opus_load_buttons[opus_saves[save]].pos = (coords[0] + 600 - 100 + sidebar_offset + 80, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset + 80 + title.get_height() + 40 + subtitle.get_height() + saved_graphs_title.get_height() + save_button.size[1] + 50)
+            if opus_removal_buttons[save].last_surface is not None:
+                opus_removal_buttons[save].on_hover()
+            opus_removal_buttons[save].create(scroll_list, 0, coords[0] + 600 - 50, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
+            opus_removal_buttons[save].pos = (coords[0] + 600 - 50 + sidebar_offset + 80, 80 + title.get_height() + 40 + subtitle.get_height() + saved_graphs_title.get_height() + save_button.size[1] + 50 + coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
+            if opus_load_buttons[save].last_surface is not None:
+                opus_load_buttons[save].on_hover()
+            opus_load_buttons[save].create(scroll_list, 0, coords[0] + 600 - 100, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset)
+            opus_load_buttons[save].pos = (coords[0] + 600 - 100 + sidebar_offset + 80, coords[1] + ((text.get_height() + 30)/2) - 20 - scroll_list_offset + 80 + title.get_height() + 40 + subtitle.get_height() + saved_graphs_title.get_height() + save_button.size[1] + 50)
             scroll_list.blit(text_shadow, (coords[0] + 10 + 1, 1 + coords[1] + ((text.get_height() + 30)/2) - (text.get_height()/2) - scroll_list_offset))
             scroll_list.blit(text, (coords[0] + 10, coords[1] + ((text.get_height() + 30)/2) - (text.get_height()/2) - scroll_list_offset))
             y_accumulated += text.get_height() + 50
@@ -269,10 +351,25 @@ def draw_save(win, sidebar_offset, save_button, save_textbox, opus_saves, opus_r
         scroll_down.create(win, 0, sidebar_offset + 100 + scroll_list.get_width(), 80 + title.get_height() + 40 + subtitle.get_height() + save_button.size[1] + 50 + scroll_down.size[1])
 
 
+def sync_opus_buttons(opus_saves, opus_removal_buttons, opus_load_buttons):
+    """Give every listed Opus save a removal and load button, reusing the buttons of saves that were already listed."""
+    for save in list(opus_removal_buttons):
+        if save not in opus_saves:
+            opus_removal_buttons.pop(save)
+            opus_load_buttons.pop(save)
+    for save in opus_saves:
+        if save not in opus_removal_buttons:
+            opus_removal_buttons[save] = Button(os.path.join(CurrentPath, 'assets', 'textures', 'remove.png'), (40, 40), EMPTY_EVENT, 0, "Del", background_colour=SIDEBAR_COLOUR)
+            opus_load_buttons[save] = Button(os.path.join(CurrentPath, 'assets', 'textures', 'load.png'), (40, 40), EMPTY_EVENT, 0, "Load", background_colour=SIDEBAR_COLOUR)
+    return opus_saves
+
+
 def main():
     # Create an opaque window surface with defined width and height, and set a title
     win = pygame.display.set_mode((WIDTH, HEIGHT), flags, 8)
     win.set_alpha(None)
+    compositor = Compositor(win, BACKGROUND_COLOUR)
+    overlay = Overlay()
     pygame.display.set_caption("Insidia")
 
     # Set the icon of the window
@@ -290,8 +387,10 @@ def main():
                          2, HEIGHT / 2 + icon_splash.get_height() / 2 + 10))
     pygame.display.update()
 
-    # Convert the demo square wave to a Relation object that can be passed to the graph
-    home_rels = [Relation(square_wave(31), DEMO_PURPLE)]
+    # Convert the demo square wave to a Relation object in the background. The home page shows a placeholder until then
+    startup = ThreadPoolExecutor(max_workers=1)
+    demo = startup.submit(load_solver, tracing.frame)
+    home_rels = []
 
     # Initialise pygame's clock and start the game loop
     clock = pygame.time.Clock()
@@ -309,7 +408,7 @@ def main():
     clicked = None
 
     # Initialise both the demo and main graphs, with the main graph including equation inputs and a clear button
-    demo_graph = Graph((600, 300))
+    demo_graph = Graph(DEMO_SIZE)
     calc_graph = Graph((650, 700), equations=5, clear=True)
 
     # Cache the last known Relations and set domain/range on the main graph
@@ -332,23 +431,33 @@ def main():
     # Create Opus directory if it does not exist
     if not os.path.isdir(os.path.join(get_opus_path(), 'opus')):
         os.mkdir(os.path.join(get_opus_path(), 'opus'))
+    opus_index = None
+    legacy_shown = set()
 
     while running:
 
         # Limit the loop to run only 60 times per second
         clock.tick(FPS)
+        frame_start = profiler.clock()
 
         # Get sidebar surface and button rects
         sidebar = get_sidebar(sidebar_state, current_state, saving_now)
 
         # Iterate through pygame events
+        start = profiler.clock()
         for event in pygame.event.get():
 
             # Exit the program if the user quit
             if event.type == pygame.QUIT:
+                tracing.write()
+                scheduler.shutdown()
                 pygame.quit()
                 sys.exit()
 
+            # Redraw the whole window if it was uncovered
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                compositor.invalidate()
+
             # Change the mode of the graph appropriate to which event occurred
             if event.type == Graph.PAN_EVENT:
                 demo_graph.set_mode(Graph.PAN)
@@ -394,6 +503,11 @@ def main():
                 if scroll_list_offset > px:
                     scroll_list_offset = px
 
+            # Show or hide the profiling overlay
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                profiler.set_enabled(not profiler.enabled)
+                compositor.invalidate()
+
             # Check if a key was pressed whilst a textbox was selected
             if event.type == pygame.KEYDOWN:
                 for textbox in calc_graph.get_textboxes() + calc_graph.get_d_r_boxes():
@@ -419,13 +533,10 @@ def main():
                             # If an Opus save was to be created, do as such
                             if saving_now[1] == OPUS:
                                 fake_graph = calc_graph.save(save_textbox.value)
-                                with open(os.path.join(get_opus_path(), 'opus', f'{real_value.lower()}.opus'), 'wb') as f:
-                                    pickle.dump(fake_graph, f)
-                                    opus_saves[f] = fake_graph
-                                    removal_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'remove.png'), (40, 40), EMPTY_EVENT, 0, "Del", background_colour=SIDEBAR_COLOUR)
-                                    opus_removal_buttons[fake_graph] = removal_button
-                                    load_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'load.png'), (40, 40), EMPTY_EVENT, 0, "Load", background_colour=SIDEBAR_COLOUR)
-                                    opus_load_buttons[fake_graph] = load_button
+                                thumbnail = pygame.transform.smoothscale(calc_graph.last_surface, (calc_graph.last_surface.get_width() // 4,
+                                                                                                   calc_graph.last_surface.get_height() // 4))
+                                opus_index.save(f'{real_value.lower()}.opus', fake_graph, thumbnail)
+                                opus_saves = sync_opus_buttons(opus_index.saves(), opus_removal_buttons, opus_load_buttons)
                                 scroll_list_offset = 0
                                 messagebox.showinfo("Save Opus Graph", f"Successfully saved opus graph to \"{str(os.path.join(get_opus_path(), 'opus', f'{real_value.lower()}.opus'))}\".")
 
@@ -476,13 +587,13 @@ def main():
                     # Handle correct removals of Opus saves and loads
                     removal = False
                     for save in opus_saves:
-                        if opus_removal_buttons[opus_saves[save]].on_click():
+                        if opus_removal_buttons[save].on_click():
                             delete = messagebox.askquestion('Delete Opus Graph', f'Are you sure you want to delete \"{opus_saves[save].name}\"?',
                                                             icon='warning')
                             if delete == 'yes':
-                                os.remove(save.name)
+                                opus_index.remove(os.path.basename(save))
                                 removal = True
-                        if opus_load_buttons[opus_saves[save]].on_click():
+                        if opus_load_buttons[save].on_click():
                             load = messagebox.askquestion('Load Opus Graph', f'Are you sure you want to load \"{opus_saves[save].name}\"?',
                                                           icon='warning')
                             if load == 'yes':
@@ -501,23 +612,25 @@ def main():
                                         textbox.value = line
                                         break
 
+                                # Reuse the curves saved with the graph, so they are drawn without being solved again
+                                from calc.opus import OpusError, read_curves
+                                try:
+                                    calc_graph.preload(read_curves(save))
+                                except (OSError, OpusError):
+                                    pass
+
+                                # Restore the domain and range the graph was saved with, if known
+                                if opus_saves[save].func_domain is not None and opus_saves[save].func_range is not None:
+                                    bounds = list(opus_saves[save].func_domain) + list(opus_saves[save].func_range)
+                                    for textbox, value in zip(calc_graph.get_d_r_boxes(), bounds):
+                                        textbox.value = str(value)
+
                                 current_state = GRAPHING
                                 messagebox.showinfo("Load Opus Graph", f"Successfully loaded \"{opus_saves[save].name}\".")
 
                     if removal:
-                        opus_saves = {}
-                        opus_load_buttons = {}
-                        opus_removal_buttons = {}
-                        for file in os.listdir(os.path.join(get_opus_path(), 'opus')):
-                            if file.lower().endswith(".opus"):
-                                with open(os.path.join(get_opus_path(), 'opus', file), "rb") as input_file:
-                                    loaded = pickle.load(input_file)
-                                    opus_saves[input_file] = loaded
-                                    removal_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'remove.png'), (40, 40), EMPTY_EVENT, 0, "Del", background_colour=SIDEBAR_COLOUR)
-                                    opus_removal_buttons[loaded] = removal_button
-                                    load_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'load.png'), (40, 40), EMPTY_EVENT, 0, "Load", background_colour=SIDEBAR_COLOUR)
-                                    opus_load_buttons[loaded] = load_button
-                                scroll_list_offset = 0
+                        opus_saves = sync_opus_buttons(opus_index.saves(), opus_removal_buttons, opus_load_buttons)
+                        scroll_list_offset = 0
 
                 # Reload sidebar after state change
                 sidebar = get_sidebar(sidebar_state, current_state, saving_now)
@@ -528,35 +641,50 @@ def main():
                         if sidebar[SIDEBAR_PAGES][state].collidepoint(event.pos):
                             if state == SAVE:
                                 if os.path.isdir(os.path.join(get_opus_path(), 'opus')):
-                                    opus_saves = {}
-                                    opus_load_buttons = {}
-                                    opus_removal_buttons = {}
-                                    for file in os.listdir(os.path.join(get_opus_path(), 'opus')):
-                                        if file.lower().endswith(".opus"):
-                                            with open(os.path.join(get_opus_path(), 'opus', file), "rb") as input_file:
-                                                loaded = pickle.load(input_file)
-                                                opus_saves[input_file] = loaded
-                                                removal_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'remove.png'), (40, 40), EMPTY_EVENT, 0, "Del", background_colour=SIDEBAR_COLOUR)
-                                                opus_removal_buttons[loaded] = removal_button
-                                                load_button = Button(os.path.join(CurrentPath, 'assets', 'textures', 'load.png'), (40, 40), EMPTY_EVENT, 0, "Load", background_colour=SIDEBAR_COLOUR)
-                                                opus_load_buttons[loaded] = load_button
-                                            scroll_list_offset = 0
+                                    opus_index = open_opus_index(opus_index)
+                                    opus_saves = sync_opus_buttons(opus_index.refresh(), opus_removal_buttons, opus_load_buttons)
+                                    scroll_list_offset = 0
+
+                                    # Tell the user once about saves from older versions, rather than hiding them silently
+                                    legacy = [file for file in opus_index.legacy() if file not in legacy_shown]
+                                    if len(legacy) > 0:
+                                        legacy_shown.update(legacy)
+                                        messagebox.showinfo("Opus Graphs", "These saves are from an older version of Insidia and are no longer supported, "
+                                                                           "so they were skipped: " + ", ".join(legacy) + ".")
                             if not Button.CLICK_CHANNEL.get_busy():
                                 Button.CLICK_CHANNEL.play(Button.CLICK_SOUND)
                             current_state = state
 
+        # Show the demo once it has been parsed
+        if demo is not None and demo.done():
+            home_rels, records = demo.result()
+            demo_graph.preload(records)
+            startup.shutdown()
+            demo = None
+
+        # Redraw the whole window if the page or sidebar changed, otherwise only the widgets that changed
+        profiler.add('events', start)
+        compositor.begin((current_state, sidebar_state, sidebar_anim_frames))
+
         # Display the homepage if the program state is HOME.
         if current_state == HOME:
-            draw_home(win, 230 if sidebar_state == EXTENDED else 0, demo_graph, home_rels)
+            start = profiler.clock()
+            draw_home(win, compositor, 230 if sidebar_state == EXTENDED else 0, demo_graph, home_rels)
+            profiler.add('draw_home', start)
             buttons_pressed = pygame.mouse.get_pressed(num_buttons=3)
             clicked = demo_graph.handle_changes(buttons_pressed, clicked)
 
         # Display the Insidia: Opus page if the program state is SAVE
         if current_state == SAVE:
-            draw_save(win, 230 if sidebar_state == EXTENDED else 0, save_button, save_textbox, opus_saves, opus_removal_buttons, opus_load_buttons, saving_now, snapshot_button, scroll_list_offset, scroll_down, scroll_up)
+            start = profiler.clock()
+            draw_save(win, compositor, 230 if sidebar_state == EXTENDED else 0, save_button, save_textbox, opus_saves, opus_removal_buttons, opus_load_buttons, saving_now, snapshot_button, scroll_list_offset, scroll_down, scroll_up)
+            profiler.add('draw_save', start)
 
         # Display the graphing calculator if the program state is HOME.
         if current_state == GRAPHING:
+            # Waits for the solver to finish loading, if the page is opened before the demo is ready
+            from calc.relations import Relation, RelationError
+
             # If an equation input is no longer active, convert and queue it to be graphed
             for textbox in calc_graph.get_textboxes():
                 if not textbox.active:
@@ -569,7 +697,7 @@ def main():
                                 if rels[textbox].get_original() != textbox.get_text():
                                     rels[textbox] = Relation(
                                         textbox.get_text(), textbox.get_colour())
-                            textbox.set_validity(True)
+                            textbox.set_validity(not calc_graph.has_failed(rels[textbox]))
                             textbox.message_shown = False
                         else:
                             if textbox in rels:
@@ -621,20 +749,45 @@ def main():
                 func_range = last_range
 
             # Draw the window
-            draw_graphing(win, 230 if sidebar_state == EXTENDED else
+            start = profiler.clock()
+            draw_graphing(win, compositor, 230 if sidebar_state == EXTENDED else
                           0, calc_graph, rels, func_domain, func_range)
+            profiler.add('draw_graphing', start)
             buttons_pressed = pygame.mouse.get_pressed(num_buttons=3)
             clicked = calc_graph.handle_changes(buttons_pressed, clicked)
 
         # Draw the sidebar onto the screen
+        sidebar_pos = (0 - sidebar_anim_frames, 0) if sidebar_state == EXTENDED else (10, 10)
+        if compositor.changed('sidebar', (sidebar_state, current_state, saving_now[0], get_sidebar_hover(sidebar), sidebar_pos)):
+            win.blit(sidebar[SIDEBAR_SURFACE], sidebar_pos)
+            compositor.mark('sidebar', sidebar[SIDEBAR_SURFACE].get_rect(topleft=sidebar_pos))
         if sidebar_state == EXTENDED:
-            win.blit(sidebar[SIDEBAR_SURFACE], (0 - sidebar_anim_frames, 0))
             sidebar_anim_frames -= 25 if 0 < sidebar_anim_frames else 0
-        else:
-            win.blit(sidebar[SIDEBAR_SURFACE], (10, 10))
 
-        pygame.display.update()
+        # Draw the profiling overlay above everything else, if it is shown
+        if profiler.enabled:
+            overlay_pos = (WIDTH - overlay.size[0] - 10, 10)
+            redraw = compositor.changed('overlay', (overlay.get_state(), overlay_pos))
+            if redraw or compositor.overlaps(pygame.Rect(overlay_pos, overlay.size)):
+                win.blit(overlay.create(clock.get_fps(), profiler.summary()), overlay_pos)
+                compositor.mark('overlay', pygame.Rect(overlay_pos, overlay.size))
+
+        # Update only the parts of the window that were redrawn
+        start = profiler.clock()
+        compositor.end()
+        profiler.add('update', start)
+        profiler.end_frame(frame_start)
 
 
 if __name__ == '__main__':
+    # Allow the calculation process pool to start inside a frozen executable
+    freeze_support()
+
+    # Record a trace of the session if asked to, either on the command line or through the environment
+    parser = argparse.ArgumentParser(description="Insidia, the graphing calculator.")
+    parser.add_argument('--trace', metavar='FILE', help="write a Chrome trace of the session to FILE on exit")
+    args = parser.parse_args()
+    tracing.enable_from_environment()
+    if args.trace:
+        tracing.set_enabled(args.trace)
     main()
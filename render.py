@@ -0,0 +1,135 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+
+# Render without a window or sound device, before pygame is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+# Defaults matching the graphing calculator
+DEFAULT_DOMAIN = (-10, 10)
+DEFAULT_RANGE = (-10, 10)
+DEFAULT_SCALE = (40, 40)
+DEFAULT_SIZE = (650, 700)
+
+
+def parse_graphs(inputs, equations, list_files, output):
+    """
+    Returns a job for every graph to render, as (name, equations, colours, domain, range, opus path).
+    Inputs are Opus files, equations are given together on the command line,
+    and each line of a list file is a graph of equations separated by semicolons, optionally named as "name: ...".
+    """
+    from calc.opus import read_manifest
+
+    graphs = []
+    for path in inputs:
+        manifest = read_manifest(path)
+        graphs.append((os.path.splitext(os.path.basename(path))[0], manifest['equations'], manifest.get('colours'),
+                       manifest.get('domain'), manifest.get('range'), os.path.abspath(path)))
+    if equations:
+        graphs.append((output or 'graph', equations, None, None, None, None))
+    for list_file in list_files:
+        with open(list_file, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if line == '' or line.startswith('#'):
+                    continue
+                name, _, line = line.rpartition(':') if ':' in line else (None, None, line)
+                name = name.strip() if name else f'{os.path.splitext(os.path.basename(list_file))[0]}-{number}'
+                graphs.append((name, [eq.strip() for eq in line.split(';') if eq.strip() != ''], None, None, None, None))
+    return graphs
+
+
+def render_graph(graph, func_domain, func_range, scale, size, out_dir) -> str:
+    """
+    Render one graph to a PNG through Graph.create, inside the current process. Saved curves of Opus files are reused.
+    Returns the path of the image, or raises RelationError if an equation is invalid or could not be calculated.
+    """
+    from commons import get_current_path
+    from calc import scheduler
+    from calc.graphing import Graph, COLOURS
+    from calc.relations import Relation, RelationError
+    from calc.opus import read_curves, OpusError
+
+    # Assets are found relative to the working directory, as they are when running main.py
+    os.chdir(get_current_path())
+
+    # Each image is rendered by one process, so relations are calculated inline rather than on another pool
+    scheduler.set_max_workers(0)
+    pygame.display.init()
+    pygame.font.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+    name, equations, colours, saved_domain, saved_range, opus_path = graph
+    func_domain = tuple(func_domain or saved_domain or DEFAULT_DOMAIN)
+    func_range = tuple(func_range or saved_range or DEFAULT_RANGE)
+    colours = colours or COLOURS
+    relations = [Relation(eq, tuple(colours[index % len(colours)])) for index, eq in enumerate(equations)]
+
+    graph_surface = Graph(size)
+    graph_surface.set_pos((0, 0))
+    if opus_path is not None:
+        try:
+            graph_surface.preload(read_curves(opus_path))
+        except (OSError, OpusError):
+            pass
+
+    # Keep drawing until every relation has been calculated
+    surface = graph_surface.create(func_domain, func_range, relations, (0, 0), scale[0], scale[1])
+    while any(len(jobs) > 0 for jobs in graph_surface.pending.values()):
+        surface = graph_surface.create(func_domain, func_range, relations, (0, 0), scale[0], scale[1])
+
+    # A relation that failed to calculate would be missing from the image, so no image is written
+    failed = [relation.get_original() for relation in relations if graph_surface.has_failed(relation)]
+    if len(failed) > 0:
+        raise RelationError(', '.join(failed))
+
+    path = os.path.join(out_dir, f'{name}.png')
+    pygame.image.save(surface, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render Insidia graphs to PNG images without opening a window.")
+    parser.add_argument('opus', nargs='*', help="Opus files to render")
+    parser.add_argument('-e', '--equation', action='append', default=[], help="an equation to graph, may be repeated")
+    parser.add_argument('-l', '--list', action='append', default=[], dest='lists',
+                        help="a text file of graphs, one per line, with equations separated by semicolons")
+    parser.add_argument('-n', '--name', help="file name of the image made from --equation")
+    parser.add_argument('--domain', nargs=2, type=float, metavar=('X_MIN', 'X_MAX'))
+    parser.add_argument('--range', nargs=2, type=float, metavar=('Y_MIN', 'Y_MAX'))
+    parser.add_argument('--scale', nargs=2, type=int, default=DEFAULT_SCALE, metavar=('X', 'Y'))
+    parser.add_argument('--size', nargs=2, type=int, default=DEFAULT_SIZE, metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('-o', '--out', default='.', help="directory to write images to")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="number of images rendered at once")
+    args = parser.parse_args(argv)
+
+    graphs = parse_graphs(args.opus, args.equation, args.lists, args.name)
+    if len(graphs) == 0:
+        parser.error("nothing to render")
+    out_dir = os.path.abspath(args.out)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Render each graph in its own worker process, reporting them in order as they finish
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(render_graph, graph, args.domain, args.range, tuple(args.scale), tuple(args.size), out_dir)
+                   for graph in graphs]
+        for graph, future in zip(graphs, futures):
+            try:
+                print(future.result())
+            except Exception as error:
+                reason = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+                print(f"{graph[0]}: could not be rendered ({reason})", file=sys.stderr)
+                failed += 1
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    freeze_support()
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import pygame
 import os
+from functools import lru_cache
 from commons import render_text, BACKGROUND_COLOUR, get_current_path
 
 
@@ -10,15 +11,32 @@ DARK_GREY = (100, 100, 100)
 WHITE = (255, 255, 255)
 BLACK = (50, 50, 50)
 
+# The most scaled and recoloured icons shared between buttons at once
+ICONS = 64
+
 
 # Fill all pixels of the surface with color, preserve transparency.
 def fill(surface, color):
-    width, height = surface.get_size()
     r, g, b = color
-    for x in range(width):
-        for y in range(height):
-            a = surface.get_at((x, y))[3]
-            surface.set_at((x, y), pygame.Color(r, g, b, a))
+    # Clear the colour channels of every pixel at once, keeping alpha, then add the new colour
+    surface.fill((0, 0, 0, 255), special_flags=pygame.BLEND_RGBA_MULT)
+    surface.fill((r, g, b, 0), special_flags=pygame.BLEND_RGBA_ADD)
+
+
+@lru_cache(maxsize=ICONS)
+def load_icon(path, size, color):
+    """Returns the image at path scaled to size and filled with color, loading it only the first time it is needed."""
+    icon = pygame.transform.scale(pygame.image.load(path).convert_alpha(), size)
+    fill(icon, color)
+    return icon
+
+
+def get_icon(path, size, color):
+    """
+    Returns the image at path scaled to size and filled with color.
+    Icons are shared between buttons, so they must not be drawn on.
+    """
+    return load_icon(path, tuple(size), tuple(color))
 
 
 class Button:
@@ -30,6 +48,7 @@ class Button:
     size: tuple
     mode: int
     last_surface: pygame.Surface | None
+    last_state: tuple | None
     hovering: bool
 
     CLICK_CHANNEL = pygame.mixer.Channel(1)
@@ -39,15 +58,14 @@ class Button:
     def __init__(self, icon, size, event, mode, label, background_colour=BACKGROUND_COLOUR) -> None:
         self.rect = None
         self.pos = None
-        self.icon = pygame.transform.scale(pygame.image.load(
-            icon).convert_alpha(), (size[0] - 10, size[1] - 10))
-        fill(self.icon, WHITE)
+        self.icon = get_icon(icon, (size[0] - 10, size[1] - 10), WHITE)
         self.size = size
         self.event = pygame.event.Event(event)
         self.mode = mode
         self.hovering = False
         self.label = label
         self.last_surface = None
+        self.last_state = None
         self.background_colour = background_colour
 
     # The method called to post the buttons event when it is clicked
@@ -68,12 +86,21 @@ class Button:
             self.hovering = False
         return self.hovering
 
+    # Return everything the button's appearance depends on, to tell if it must be drawn again
+    def get_state(self, mode) -> tuple:
+        return self.hovering, mode == self.mode
+
     # Given a surface, draw on it the button and image or text label respective to hover status
     def create(self, surface, mode, left, top) -> None:
 
         # Cache current position
         self.pos = (left, top)
-        
+
+        # Reuse the last surface if the button looks the same as when it was drawn
+        if self.last_surface is not None and self.last_state == self.get_state(mode):
+            surface.blit(self.last_surface, (left, top))
+            return
+
         # Prepare the surface everything will draw on
         button_surface = pygame.Surface(
             (self.size[0] + 2, self.size[1] + 2))
@@ -98,5 +125,6 @@ class Button:
         
         # Cache the last known surface for efficiency
         self.last_surface = button_surface
+        self.last_state = self.get_state(mode)
         
         surface.blit(button_surface, (left, top))
@@ -0,0 +1,65 @@
+import pygame
+
+
+class Compositor:
+    """
+    The compositor structure tracks which regions of the window have changed since the last frame.
+    Each widget reports a key describing its state, and is only redrawn when that key changes,
+    so that only the changed rectangles are passed to the display. An idle window updates nothing.
+    """
+    surface: pygame.Surface
+    background: tuple
+    page: object
+    full: bool
+    dirty: list
+    regions: dict
+
+    # Initialise the compositor for a window surface, with the colour shown behind every widget
+    def __init__(self, surface, background) -> None:
+        self.surface = surface
+        self.background = background
+        self.page = None
+        self.full = True
+        self.dirty = []
+        self.regions = {}
+
+    # Start a frame. The whole window is redrawn if the page or its layout is different to the last frame
+    def begin(self, page) -> None:
+        if page != self.page:
+            self.page = page
+            self.full = True
+
+    # Redraw the whole window this frame, such as after it was covered by another window
+    def invalidate(self) -> None:
+        self.full = True
+
+    # Return if a region must be redrawn, clearing the area it last covered if so
+    def changed(self, region, key) -> bool:
+        last = self.regions.get(region)
+        if not self.full and last is not None and last[0] == key:
+            return False
+        if not self.full and last is not None and last[1] is not None:
+            self.surface.fill(self.background, last[1])
+            self.dirty.append(last[1])
+        self.regions[region] = (key, None)
+        return True
+
+    # Return if anything drawn this frame overlaps a rect, so that whatever is drawn above it must be drawn again
+    def overlaps(self, rect) -> bool:
+        return self.full or pygame.Rect(rect).collidelist(self.dirty) != -1
+
+    # Record the area a region was redrawn over
+    def mark(self, region, rect) -> None:
+        rect = pygame.Rect(rect)
+        self.regions[region] = (self.regions[region][0], rect)
+        if not self.full:
+            self.dirty.append(rect)
+
+    # Finish a frame, updating only the parts of the display that were redrawn
+    def end(self) -> None:
+        if self.full:
+            pygame.display.update()
+        elif len(self.dirty) > 0:
+            pygame.display.update(self.dirty)
+        self.full = False
+        self.dirty = []
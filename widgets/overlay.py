@@ -0,0 +1,68 @@
+import time
+import pygame
+from commons import render_text
+
+# RGB colour constants
+WHITE = (255, 255, 255)
+GREY = (170, 170, 170)
+YELLOW = (253, 248, 140)
+PANEL = (20, 21, 26)
+
+# Names shown for each stage recorded by the profiler, in the order they happen in a frame
+STAGE_NAMES = {'events': "Events", 'draw_home': "Draw home", 'draw_graphing': "Draw graphing",
+               'draw_save': "Draw Opus", 'graph_hit': "Graph (cached)", 'graph_miss': "Graph (redrawn)",
+               'update': "Display update"}
+
+
+class Overlay:
+    """
+    The overlay structure shows the frame rate, frame time percentiles and the time spent in each stage of a frame,
+    as summarised by the profiler, along with how long each relation took to solve and how many points it sampled.
+    It only changes a few times a second, so that it stays readable and costs little to draw.
+    """
+    size: tuple
+    px: int
+    rows: int
+
+    # Seconds between refreshes, and the most relations listed
+    REFRESH = 0.25
+    MAX_RELATIONS = 6
+
+    # Initialise the Overlay with a fixed size, large enough for every stage and relation
+    def __init__(self, px=14) -> None:
+        self.px = px
+        self.rows = 3 + len(STAGE_NAMES) + self.MAX_RELATIONS
+        self.size = (340, self.rows * (px + 4) + 10)
+
+    # Return a value that changes whenever the overlay is due to be refreshed
+    def get_state(self) -> int:
+        return int(time.perf_counter() / self.REFRESH)
+
+    # Return a pygame Surface with the profiler's summary
+    def create(self, fps, summary) -> pygame.Surface:
+        overlay_surface = pygame.Surface(self.size)
+        overlay_surface.fill(PANEL)
+
+        # Frame rate and frame time percentiles
+        percentiles = "  ".join(f"p{percentile} {seconds * 1000:.1f}ms"
+                                for percentile, seconds in summary['percentiles'].items())
+        rows = [(f"FPS {fps:.0f}", percentiles, YELLOW), ("Stage", "mean per frame", GREY)]
+
+        # Mean time of each stage per frame, and how many times it ran
+        for stage, name in STAGE_NAMES.items():
+            seconds, calls = summary['stages'].get(stage, (0, 0))
+            rows.append((name, f"{seconds * 1000:.2f}ms  x{calls:.1f}", WHITE))
+
+        # The latest solve time and sample count of each relation
+        rows.append(("Relation", "solve, points", GREY))
+        for name, (solve, samples) in list(summary['relations'].items())[-self.MAX_RELATIONS:]:
+            name = name if len(name) <= 18 else name[:15] + "..."
+            rows.append((name, f"{solve * 1000:.1f}ms  {samples}", WHITE))
+
+        # Labels are aligned to the left, and values to the right
+        for index, (label, value, colour) in enumerate(rows):
+            top = 5 + index * (self.px + 4)
+            overlay_surface.blit(render_text(label, self.px, color=colour), (8, top))
+            value = render_text(value, self.px, color=colour)
+            overlay_surface.blit(value, (self.size[0] - 8 - value.get_width(), top))
+        return overlay_surface
@@ -23,6 +23,7 @@ class Slider:
     x_increment: float
     current_x: float
     current_surface: pygame.Surface | None
+    last_state: tuple | None
     pos: tuple | None
     clicked: bool
     tooltip: bool
@@ -39,6 +40,7 @@ class Slider:
         self.default = default
         self.reset()
         self.current_surface = None
+        self.last_state = None
         self.pos = None
         self.clicked = False
         self.tooltip = False
@@ -84,9 +86,17 @@ class Slider:
     def get_tooltip(self) -> bool:
         return self.tooltip
     
+    # Return everything the slider's appearance depends on, to tell if it must be drawn again
+    def get_state(self) -> tuple:
+        return self.current_x, self.tooltip
+
     # Return a pygame Surface with the interactive slider
     def create(self) -> pygame.Surface:
 
+        # Reuse the last surface if the slider looks the same as when it was drawn
+        if self.current_surface is not None and self.last_state == self.get_state():
+            return self.current_surface
+
         # Create transparent surface
         slider_surface = pygame.Surface(
             (self.size_x + self.radius * 2 + 50, self.size_y + self.radius + 50))
@@ -117,5 +127,6 @@ class Slider:
         
         # Cache the last known surface for efficiency
         self.current_surface = slider_surface
+        self.last_state = self.get_state()
         
         return slider_surface
@@ -23,6 +23,7 @@ class Textbox:
     pos: tuple | None
     default: str
     last_surface: pygame.Surface | None
+    last_state: tuple | None
     cursor_pos: int
     valid: bool
     message_shown: bool
@@ -51,6 +52,7 @@ class Textbox:
         self.colour = colour
         self.pos = None
         self.last_surface = None
+        self.last_state = None
         self.cursor_pos = 0
         self.valid = True
         self.message_shown = False
@@ -66,12 +68,21 @@ class Textbox:
         self.cursor_pos = len(self.value)
         self.active = active
 
+    # Return everything the textbox's appearance depends on, to tell if it must be drawn again
+    def get_state(self) -> tuple:
+        return self.value, self.active, self.valid, self.cursor_pos
+
     # Given a surface, draw on it the textbox and its value respective of the cursor
     def create(self, surface, left, top) -> None:
         
         # Cache current position
         self.pos = (left, top)
 
+        # Reuse the last surface if the textbox looks the same as when it was drawn
+        if self.last_surface is not None and self.last_state == self.get_state():
+            surface.blit(self.last_surface, (left, top))
+            return
+
         # Render a readable title
         if self.active:
             title_text = "'ENTER' key to finish!"
@@ -125,6 +136,7 @@ class Textbox:
             
         # Cache the last known surface for efficiency
         self.last_surface = textbox_surface
+        self.last_state = self.get_state()
         
         surface.blit(textbox_surface, (left, top))
 